@@ -1,15 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import logging
 
 from app.database import get_db
 from app.models.domain import Domain
 from app.services.scanner import DomainScanner
+from app.core.config import settings
+from app.services.outbound import outbound
+from app.services.work_queue import LocalWorkQueue, RedisWorkQueue
+from app.services.worker import submit_scan
+from app.services.history import (
+    MOVER_METRICS, record_observations, compact_history, get_domain_history, get_top_movers
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# 未配置 Redis 时，用进程内的 TTL 锁给历史压缩节流
+_local_locks = LocalWorkQueue()
+
 
 @router.get("/domains")
 def get_domains(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
@@ -44,6 +54,32 @@ def get_stats(db: Session = Depends(get_db)):
     }
 
 
+@router.get("/outbound")
+def get_outbound_status():
+    """外部服务的限速、熔断与调用计数"""
+    return outbound.snapshot()
+
+
+@router.get("/history/movers")
+def get_history_movers(days: int = 7, limit: int = 20, metric: str = "da_score",
+                       direction: str = "up", db: Session = Depends(get_db)):
+    """窗口内指标变化最大的域名"""
+    if metric not in MOVER_METRICS:
+        raise HTTPException(status_code=400, detail=f"不支持的指标: {metric}")
+    if direction not in ("up", "down", "abs"):
+        raise HTTPException(status_code=400, detail=f"不支持的排序方向: {direction}")
+    return get_top_movers(db, days=days, limit=limit, metric=metric, direction=direction)
+
+
+@router.get("/history/{domain_name}")
+def get_history(domain_name: str, days: Optional[int] = None, db: Session = Depends(get_db)):
+    """单个域名的指标历史"""
+    points = get_domain_history(db, domain_name, days=days)
+    if not points:
+        raise HTTPException(status_code=404, detail="没有该域名的历史数据")
+    return {"name": domain_name, "points": points}
+
+
 @router.post("/scan")
 async def scan_domains(mode: str = "expireddomains", db: Session = Depends(get_db)):
     """扫描域名 - 直接返回域名列表"""
@@ -103,5 +139,48 @@ async def scan_domains(mode: str = "expireddomains", db: Session = Depends(get_d
         db.rollback()
         logger.error(f"数据库提交失败: {e}")
     
+    try:
+        # 追加本次扫描所有抓取域名的指标快照（单独提交，不受后面压缩失败影响）
+        record_observations(db, result.get("observations", []))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"历史快照写入失败: {e}")
+
+    _maybe_compact_history(db)
+    
     # 🔥🔥🔥 关键修改：直接返回列表，而不是字典！
-    return return_domains
\ No newline at end of file
+    return return_domains
+
+
+def _maybe_compact_history(db: Session):
+    """每 history_compact_interval 秒最多压缩一次；配置了 Redis 时与 worker 集群共用同一把锁"""
+    try:
+        locks = _work_queue() if settings.redis_url else _local_locks
+        if not locks.try_lock("compact_history", settings.history_compact_interval):
+            return
+        compact_history(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"历史压缩失败: {e}")
+
+
+def _work_queue() -> RedisWorkQueue:
+    if not settings.redis_url:
+        raise HTTPException(status_code=503, detail="未配置 REDIS_URL，无法使用分布式扫描")
+    return RedisWorkQueue.from_url(settings.redis_url, lease_seconds=settings.worker_lease_seconds)
+
+
+@router.post("/scan/distributed")
+def scan_distributed(pages: int = 40, pages_per_job: Optional[int] = None):
+    """把扫描切分成任务投递到共享队列，由 worker 进程执行"""
+    if pages < 1:
+        raise HTTPException(status_code=400, detail="pages 必须大于 0")
+    return submit_scan(_work_queue(), pages, pages_per_job)
+
+
+@router.get("/scan/queue")
+def get_scan_queue():
+    """共享队列中待处理和执行中的任务数"""
+    return _work_queue().stats()
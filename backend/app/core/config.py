@@ -18,6 +18,48 @@ class Settings(BaseSettings):
     ai_model_claude: str = "claude-3-5-sonnet-20241022"
     ai_model_gemini: str = "gemini-2.0-flash-exp"
     
+    # History (指标时间序列)
+    history_batch_size: int = 500  # 快照批量写入的每批行数
+    history_raw_retention_days: int = 7  # 原始快照保留天数，之后压缩为按天汇总
+    history_rollup_retention_days: int = 365  # 按天汇总保留天数
+    history_compact_interval: int = 3600  # 历史压缩的最小间隔（秒），API 与 worker 集群共用
+
+    # Worker fleet (分布式扫描)
+    redis_url: str = ""  # 共享队列；为空时不可提交分布式扫描
+    worker_pages_per_job: int = 4  # 每个抓取任务负责的页数
+    worker_score_batch: int = 100  # 每个 DA 评分任务的域名数（OpenPageRank 单次上限）
+    worker_verify_batch: int = 5  # 每个 WHOIS 验证任务的域名数
+    worker_verify_min_da: int = 10  # DA 达到该值才进入 WHOIS 验证
+    worker_lease_seconds: int = 300  # 任务租约时长，超时未完成则重新入队
+    worker_max_attempts: int = 3  # 任务最多被重新投递的次数
+    worker_claim_ttl: int = 86400  # 域名去重锁的有效期（秒）
+
+    # Outbound (对外请求的限速 / 并发 / 重试 / 熔断，每个服务一组)
+    outbound_expireddomains_rate: float = 1.0  # 每秒请求数；抓取页面最怕被封，限速最严
+    outbound_expireddomains_burst: int = 4
+    outbound_expireddomains_max_concurrency: int = 4
+    outbound_expireddomains_max_retries: int = 2
+    outbound_expireddomains_failure_threshold: int = 4
+    outbound_expireddomains_reset_timeout: float = 120.0
+    outbound_openpagerank_rate: float = 1.0  # 免费额度约每秒 1 个批次
+    outbound_openpagerank_burst: int = 1
+    outbound_openpagerank_max_concurrency: int = 1
+    outbound_openpagerank_max_retries: int = 2
+    outbound_openpagerank_failure_threshold: int = 3
+    outbound_openpagerank_reset_timeout: float = 60.0
+    outbound_whois_rate: float = 2.0
+    outbound_whois_burst: int = 2
+    outbound_whois_max_concurrency: int = 2
+    outbound_whois_max_retries: int = 1
+    outbound_whois_failure_threshold: int = 5
+    outbound_whois_reset_timeout: float = 60.0
+    outbound_bark_rate: float = 5.0
+    outbound_bark_burst: int = 5
+    outbound_bark_max_concurrency: int = 2
+    outbound_bark_max_retries: int = 2
+    outbound_bark_failure_threshold: int = 3
+    outbound_bark_reset_timeout: float = 30.0
+
     # App Config
     debug: bool = False
     app_name: str = "DropRadar"
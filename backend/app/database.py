@@ -1,5 +1,7 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 
@@ -30,4 +32,10 @@ def get_db() -> Session:
 
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+
+
+def dialect_insert(db: Session, table):
+    """返回支持 ON CONFLICT 的 insert()（PostgreSQL / SQLite）"""
+    insert_fn = {"postgresql": pg_insert, "sqlite": sqlite_insert}[db.get_bind().dialect.name]
+    return insert_fn(table)
\ No newline at end of file
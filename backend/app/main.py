@@ -1,7 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.config import settings
 from app.database import init_db, Base, engine
+from app.models import HISTORY_TABLES
 from app.api.v1 import endpoints
+from app.services.outbound import outbound
 
 app = FastAPI(title="DropRadar", version="1.0.0")
 
@@ -14,10 +17,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 初始化数据库 - 重建表（删除旧表+创建新表）
-Base.metadata.drop_all(bind=engine)
+# 初始化数据库 - 重建表（删除旧表+创建新表），历史快照表保留
+Base.metadata.drop_all(bind=engine, tables=[t for t in Base.metadata.sorted_tables if t not in HISTORY_TABLES])
 init_db()
 
+# 配置了共享 Redis 时，API 的同步扫描与 worker 集群共用同一份限速和熔断状态
+if settings.redis_url:
+    import redis
+    outbound.use_redis(redis.Redis.from_url(settings.redis_url))
+
 # 路由
 app.include_router(endpoints.router, prefix="/api/v1")
 
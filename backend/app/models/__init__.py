@@ -1 +1,4 @@
-# Empty init file
\ No newline at end of file
+from .domain import Domain
+from .observation import DomainObservation, DomainDailyRollup, HISTORY_TABLES
+
+__all__ = ["Domain", "DomainObservation", "DomainDailyRollup", "HISTORY_TABLES"]
@@ -0,0 +1,56 @@
+from sqlalchemy import Column, Integer, String, Date, Float, DateTime, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class DomainObservation(Base):
+    """每次扫描追加一行的原始指标快照（只追加，不更新）"""
+    __tablename__ = "domain_observations"
+
+    id = Column(Integer, primary_key=True)
+    domain_name = Column(String(255), nullable=False)
+    scan_id = Column(String(36), nullable=False)  # 同一次扫描共享的批次 ID
+
+    da_score = Column(Integer, nullable=True)  # 本次未评分的域名为 NULL，而不是 0
+    backlinks = Column(Integer, default=0)
+    status = Column(String(50))
+
+    observed_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("scan_id", "domain_name", name="uq_domain_observations_scan_name"),
+        Index("ix_domain_observations_name_time", "domain_name", "observed_at"),
+        Index("ix_domain_observations_observed_at", "observed_at"),
+    )
+
+    def __repr__(self):
+        return f"<DomainObservation {self.domain_name} @ {self.observed_at} - DA:{self.da_score}>"
+
+
+class DomainDailyRollup(Base):
+    """过期原始快照压缩后的按天汇总"""
+    __tablename__ = "domain_daily_rollups"
+
+    id = Column(Integer, primary_key=True)
+    domain_name = Column(String(255), nullable=False)
+    day = Column(Date, nullable=False)
+
+    samples = Column(Integer, default=0)  # 被压缩的原始快照数
+    da_samples = Column(Integer, default=0)  # 其中带 DA 分数的快照数
+    da_min = Column(Integer, nullable=True)
+    da_max = Column(Integer, nullable=True)
+    da_avg = Column(Float, nullable=True)
+    backlinks_max = Column(Integer, default=0)
+    backlinks_avg = Column(Float, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("domain_name", "day", name="uq_domain_daily_rollups_name_day"),
+        Index("ix_domain_daily_rollups_day", "day"),
+    )
+
+    def __repr__(self):
+        return f"<DomainDailyRollup {self.domain_name} {self.day} - DA:{self.da_avg} ({self.samples})>"
+
+
+# 历史表不随应用启动时的重建表一起删除
+HISTORY_TABLES = (DomainObservation.__table__, DomainDailyRollup.__table__)
@@ -1,4 +1,26 @@
 from .scanner import DomainScanner
 from .notification import notify_bark
+from .outbound import outbound, OutboundManager, OutboundError, CircuitOpenError
+from .history import record_observations, compact_history, get_domain_history, get_top_movers
+from .work_queue import Job, WorkQueue, LocalWorkQueue, RedisWorkQueue
+from .worker import ScanWorker, submit_scan, merge_domains
 
-__all__ = ["DomainScanner", "notify_bark"]
+__all__ = [
+    "DomainScanner",
+    "notify_bark",
+    "outbound",
+    "OutboundManager",
+    "OutboundError",
+    "CircuitOpenError",
+    "record_observations",
+    "compact_history",
+    "get_domain_history",
+    "get_top_movers",
+    "Job",
+    "WorkQueue",
+    "LocalWorkQueue",
+    "RedisWorkQueue",
+    "ScanWorker",
+    "submit_scan",
+    "merge_domains",
+]
@@ -0,0 +1,251 @@
+import logging
+import uuid
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, delete, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database import dialect_insert
+from app.models.observation import DomainDailyRollup, DomainObservation
+
+logger = logging.getLogger(__name__)
+
+# 支持排行的指标 -> (原始快照列, 按天汇总列)
+MOVER_METRICS = {
+    "da_score": (DomainObservation.da_score, DomainDailyRollup.da_avg),
+    "backlinks": (DomainObservation.backlinks, DomainDailyRollup.backlinks_avg),
+}
+
+
+def _as_date(value) -> date:
+    """func.date() 在 SQLite 返回字符串，在 PostgreSQL 返回 date"""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def record_observations(db: Session, domains: List[Dict], scan_id: Optional[str] = None,
+                        observed_at: Optional[datetime] = None) -> int:
+    """
+    将一次扫描的域名指标追加写入快照表（分批写入，不提交事务）
+    每个域名每次扫描只有一行：同一批内重复的域名取最后一条，已写过的 (scan_id, 域名) 直接跳过
+    没有 da_score 的域名（本次未评分）记为 NULL
+    :return: 本批去重后的行数
+    """
+    if not domains:
+        return 0
+
+    scan_id = scan_id or str(uuid.uuid4())
+    observed_at = observed_at or datetime.now()
+    by_name = {
+        d["name"]: {
+            "domain_name": d["name"],
+            "scan_id": scan_id,
+            "da_score": d.get("da_score"),
+            "backlinks": d.get("backlinks") or 0,
+            "status": d.get("status"),
+            "observed_at": observed_at,
+        }
+        for d in domains
+    }
+    rows = list(by_name.values())
+
+    batch_size = max(1, settings.history_batch_size)
+    for i in range(0, len(rows), batch_size):
+        stmt = dialect_insert(db, DomainObservation).values(rows[i:i + batch_size])
+        db.execute(stmt.on_conflict_do_nothing(index_elements=["scan_id", "domain_name"]))
+
+    logger.info(f"📈 记录 {len(rows)} 条指标快照 (scan_id={scan_id})")
+    return len(rows)
+
+
+def compact_history(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    压缩历史数据并执行保留策略（不提交事务）：
+    1. 早于原始保留期的快照按 (域名, 天) 聚合进 domain_daily_rollups，然后删除
+    2. 早于汇总保留期的按天汇总直接删除
+    """
+    now = now or datetime.now()
+    raw_cutoff = datetime.combine(now.date() - timedelta(days=settings.history_raw_retention_days), time.min)
+    rollup_cutoff = now.date() - timedelta(days=settings.history_rollup_retention_days)
+
+    day_col = func.date(DomainObservation.observed_at)
+    groups = db.execute(
+        select(
+            DomainObservation.domain_name,
+            day_col,
+            func.count(),
+            func.count(DomainObservation.da_score),
+            func.min(DomainObservation.da_score),
+            func.max(DomainObservation.da_score),
+            func.avg(DomainObservation.da_score),
+            func.max(DomainObservation.backlinks),
+            func.avg(DomainObservation.backlinks),
+        )
+        .where(DomainObservation.observed_at < raw_cutoff)
+        .group_by(DomainObservation.domain_name, day_col)
+    ).all()
+
+    compacted = 0
+    if groups:
+        days = {_as_date(g[1]) for g in groups}
+        existing = {
+            (r.domain_name, r.day): r
+            for r in db.query(DomainDailyRollup).filter(DomainDailyRollup.day.in_(days))
+        }
+
+        for name, day, samples, da_samples, da_min, da_max, da_avg, bl_max, bl_avg in groups:
+            day = _as_date(day)
+            da_avg = float(da_avg) if da_samples else None
+            bl_avg = float(bl_avg or 0)
+            rollup = existing.get((name, day))
+
+            if rollup is None:
+                db.add(DomainDailyRollup(
+                    domain_name=name,
+                    day=day,
+                    samples=samples,
+                    da_samples=da_samples,
+                    da_min=da_min,
+                    da_max=da_max,
+                    da_avg=da_avg,
+                    backlinks_max=bl_max or 0,
+                    backlinks_avg=bl_avg,
+                ))
+            else:
+                # 同一天被分多次压缩时按样本数加权合并（DA 只按有分数的样本加权）
+                total = rollup.samples + samples
+                rollup.backlinks_avg = (rollup.backlinks_avg * rollup.samples + bl_avg * samples) / total
+                rollup.backlinks_max = max(rollup.backlinks_max, bl_max or 0)
+                rollup.samples = total
+                if da_samples:
+                    da_total = rollup.da_samples + da_samples
+                    rollup.da_avg = ((rollup.da_avg or 0) * rollup.da_samples + da_avg * da_samples) / da_total
+                    rollup.da_min = da_min if rollup.da_min is None else min(rollup.da_min, da_min)
+                    rollup.da_max = da_max if rollup.da_max is None else max(rollup.da_max, da_max)
+                    rollup.da_samples = da_total
+
+            compacted += samples
+
+        db.flush()
+        db.execute(delete(DomainObservation).where(DomainObservation.observed_at < raw_cutoff))
+
+    expired = db.execute(
+        delete(DomainDailyRollup).where(DomainDailyRollup.day < rollup_cutoff)
+    ).rowcount or 0
+
+    if compacted or expired:
+        logger.info(f"🗜️ 历史压缩: {compacted} 条快照 -> {len(groups)} 条按天汇总，清理 {expired} 条过期汇总")
+
+    return {"compacted": compacted, "rollups": len(groups), "expired": expired}
+
+
+def get_domain_history(db: Session, domain_name: str, days: Optional[int] = None) -> List[Dict]:
+    """返回单个域名按时间升序的指标序列（旧数据为按天汇总，新数据为原始快照）"""
+    rollups = db.query(DomainDailyRollup).filter(DomainDailyRollup.domain_name == domain_name)
+    raws = db.query(DomainObservation).filter(DomainObservation.domain_name == domain_name)
+
+    if days is not None:
+        since = datetime.now() - timedelta(days=days)
+        rollups = rollups.filter(DomainDailyRollup.day >= since.date())
+        raws = raws.filter(DomainObservation.observed_at >= since)
+
+    points = [
+        {
+            "timestamp": datetime.combine(r.day, time.min),
+            "resolution": "daily",
+            "samples": r.samples,
+            "da_score": None if r.da_avg is None else round(r.da_avg),
+            "da_min": r.da_min,
+            "da_max": r.da_max,
+            "backlinks": round(r.backlinks_avg),
+            "backlinks_max": r.backlinks_max,
+            "status": None,
+        }
+        for r in rollups.order_by(DomainDailyRollup.day)
+    ]
+    points.extend(
+        {
+            "timestamp": o.observed_at,
+            "resolution": "raw",
+            "samples": 1,
+            "da_score": o.da_score,
+            "da_min": o.da_score,
+            "da_max": o.da_score,
+            "backlinks": o.backlinks,
+            "backlinks_max": o.backlinks,
+            "status": o.status,
+        }
+        for o in raws.order_by(DomainObservation.observed_at)
+    )
+    return points
+
+
+def _series_endpoints(db: Session, name_col, ts_col, value_col, since) -> Dict[str, Dict]:
+    """每个域名在窗口内最早和最晚一个有值的点的 (时间, 值)"""
+    bounds = (
+        select(
+            name_col.label("name"),
+            func.min(ts_col).label("first_ts"),
+            func.max(ts_col).label("last_ts"),
+        )
+        .where(ts_col >= since, value_col.isnot(None))
+        .group_by(name_col)
+        .subquery()
+    )
+
+    result: Dict[str, Dict] = {}
+    for edge in ("first", "last"):
+        edge_ts = bounds.c[f"{edge}_ts"]
+        rows = db.execute(
+            select(name_col, ts_col, value_col)
+            .join(bounds, and_(name_col == bounds.c.name, ts_col == edge_ts))
+            .where(value_col.isnot(None))
+        )
+        for name, ts, value in rows:
+            result.setdefault(name, {})[edge] = (ts, float(value))
+    return result
+
+
+def get_top_movers(db: Session, days: int = 7, limit: int = 20,
+                   metric: str = "da_score", direction: str = "up") -> List[Dict]:
+    """
+    窗口内指标变化最大的域名
+    :param metric: da_score 或 backlinks
+    :param direction: up（涨幅最大）、down（跌幅最大）或 abs（绝对变化最大）
+    """
+    raw_col, rollup_col = MOVER_METRICS[metric]
+    since = datetime.now() - timedelta(days=days)
+
+    daily = _series_endpoints(db, DomainDailyRollup.domain_name, DomainDailyRollup.day, rollup_col, since.date())
+    raw = _series_endpoints(db, DomainObservation.domain_name, DomainObservation.observed_at, raw_col, since)
+
+    movers = []
+    for name in daily.keys() | raw.keys():
+        # 按天汇总总是早于原始快照：起点优先取汇总，终点优先取原始快照
+        first = daily[name]["first"] if name in daily else raw[name]["first"]
+        last = raw[name]["last"] if name in raw else daily[name]["last"]
+        change = last[1] - first[1]
+        if change == 0 or (direction == "up" and change < 0) or (direction == "down" and change > 0):
+            continue
+        movers.append({
+            "name": name,
+            "metric": metric,
+            "start": round(first[1], 2),
+            "end": round(last[1], 2),
+            "change": round(change, 2),
+            "start_at": first[0],
+            "end_at": last[0],
+        })
+
+    if direction == "down":
+        movers.sort(key=lambda m: m["change"])
+    elif direction == "abs":
+        movers.sort(key=lambda m: abs(m["change"]), reverse=True)
+    else:
+        movers.sort(key=lambda m: m["change"], reverse=True)
+    return movers[:limit]
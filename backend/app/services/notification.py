@@ -2,6 +2,8 @@ import requests
 import logging
 from typing import Optional
 
+from app.services.outbound import OutboundHTTPError, outbound
+
 logger = logging.getLogger(__name__)
 
 
@@ -41,15 +43,19 @@ def notify_bark(bark_key: str, title: str, content: str, url: Optional[str] = No
         # Add notification sound (optional)
         params['sound'] = 'alarm'
         
-        response = requests.get(api_url, params=params, timeout=5)
+        def _send():
+            response = requests.get(api_url, params=params, timeout=5)
+            if response.status_code != 200:
+                raise OutboundHTTPError("bark", response.status_code)
+            return response
         
-        if response.status_code == 200:
-            logger.info(f"Bark notification sent: {title}")
-            return True
-        else:
-            logger.error(f"Bark API error: {response.status_code}")
-            return False
+        outbound.call("bark", _send)
+        logger.info(f"Bark notification sent: {title}")
+        return True
             
+    except OutboundHTTPError as e:
+        logger.error(f"Bark API error: {e.status_code}")
+        return False
     except Exception as e:
         logger.error(f"Failed to send Bark notification: {e}")
         return False
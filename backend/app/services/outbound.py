@@ -0,0 +1,477 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class OutboundError(Exception):
+    """外部服务调用失败"""
+
+
+class OutboundHTTPError(OutboundError):
+    """外部服务返回了非预期的 HTTP 状态码"""
+
+    def __init__(self, service: str, status_code: int):
+        super().__init__(f"{service} returned HTTP {status_code}")
+        self.service = service
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        # 429 和 5xx 视为服务端暂时不可用；其余 4xx 是请求本身的问题，重试无意义
+        return self.status_code == 429 or self.status_code >= 500
+
+
+class CircuitOpenError(OutboundError):
+    """熔断器打开，调用被直接拒绝"""
+
+    def __init__(self, service: str, retry_in: float):
+        super().__init__(f"{service} circuit open, retry in {retry_in:.1f}s")
+        self.service = service
+        self.retry_in = retry_in
+
+
+@dataclass
+class ServicePolicy:
+    rate: float = 5.0  # 令牌桶：每秒补充的请求数
+    burst: int = 5  # 令牌桶容量
+    max_concurrency: int = 4  # 同时在途的请求上限
+    max_retries: int = 2  # 失败后的额外重试次数
+    backoff_base: float = 0.5  # 指数退避基数（秒）
+    backoff_max: float = 8.0  # 单次退避上限（秒）
+    failure_threshold: int = 5  # 连续失败多少次后熔断
+    reset_timeout: float = 60.0  # 熔断后多久放行一次探测请求（秒）
+
+
+class TokenBucket:
+    """线程安全的令牌桶；先预支令牌再按欠额等待，保证先到先得"""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """取走一个令牌，返回调用方需要等待的秒数"""
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class CircuitBreaker:
+    """closed -> open（连续失败达到阈值）-> half_open（冷却后放行一次探测）-> closed / open"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def retry_in(self) -> float:
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - self._clock())
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and self.retry_in() <= 0:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def release_probe(self):
+        """探测请求既没成功也没失败（如被取消）时归还探测名额，避免熔断器卡在 half_open"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+
+    def record_failure(self) -> bool:
+        """记录一次失败，返回本次是否触发了熔断"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                tripped = self.state != self.OPEN
+                self.state = self.OPEN
+                self.opened_at = self._clock()
+                self._probing = False
+                return tripped
+            return False
+
+
+# 以 Redis 服务器时间计算令牌，所有进程/节点共用一个桶
+_REDIS_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+if tokens >= 0 then return '0' end
+return tostring(-tokens / rate)
+"""
+
+
+class _RedisGuard:
+    """Redis 不可用时记录一次告警并让调用方退回进程内状态，恢复后再记录一次"""
+
+    def __init__(self, key: str):
+        from redis.exceptions import RedisError
+
+        self.errors = (RedisError,)
+        self.key = key
+        self.degraded = False
+
+    def failed(self, exc: Exception):
+        if not self.degraded:
+            self.degraded = True
+            logger.warning(f"⚠️ Redis 不可用，{self.key} 暂用进程内限速 / 熔断: {exc}")
+
+    def ok(self):
+        if self.degraded:
+            self.degraded = False
+            logger.info(f"✅ Redis 已恢复，{self.key} 重新使用共享状态")
+
+
+class RedisTokenBucket:
+    """与 TokenBucket 接口相同、状态存放在 Redis 中的全局令牌桶；Redis 出错时退回进程内的 fallback 桶"""
+
+    def __init__(self, client, key: str, rate: float, burst: int, fallback: Optional[TokenBucket] = None):
+        self.redis = client
+        self.key = key
+        self.rate = rate
+        self.capacity = burst
+        self.fallback = fallback or TokenBucket(rate, burst)
+        self._guard = _RedisGuard(key)
+        self._script = client.register_script(_REDIS_BUCKET_LUA)
+
+    @property
+    def tokens(self) -> float:
+        try:
+            value = self.redis.hget(self.key, "tokens")
+        except self._guard.errors:
+            return self.fallback.tokens
+        return float(value) if value is not None else float(self.capacity)
+
+    def reserve(self) -> float:
+        try:
+            wait = float(self._script(keys=[self.key], args=[self.rate, self.capacity]))
+        except self._guard.errors as e:
+            self._guard.failed(e)
+            return self.fallback.reserve()
+        self._guard.ok()
+        return wait
+
+
+class RedisCircuitBreaker(CircuitBreaker):
+    """
+    本地熔断器 + 集群共享的 open 标记：任一进程熔断后，其他进程在冷却期内同样快速失败
+    共享标记只同步 open 状态：冷却结束后只有触发熔断的进程进入 half_open 放行一次探测，
+    其余进程本地仍是 closed，会直接恢复放量（若服务仍故障，会各自累计失败并再次熔断）
+    Redis 出错时忽略共享标记，只按本地状态判断
+    """
+
+    def __init__(self, client, key: str, failure_threshold: int, reset_timeout: float,
+                 clock: Callable[[], float] = time.monotonic):
+        super().__init__(failure_threshold, reset_timeout, clock=clock)
+        self.redis = client
+        self.key = key
+        self._guard = _RedisGuard(key)
+
+    def _shared(self, fn, default=None):
+        try:
+            result = fn()
+        except self._guard.errors as e:
+            self._guard.failed(e)
+            return default
+        self._guard.ok()
+        return result
+
+    def _shared_open_for(self) -> float:
+        ttl_ms = self._shared(lambda: self.redis.pttl(self.key))
+        return ttl_ms / 1000.0 if ttl_ms and ttl_ms > 0 else 0.0
+
+    def retry_in(self) -> float:
+        return max(super().retry_in(), self._shared_open_for())
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED and self._shared_open_for() > 0:
+            return False
+        return super().allow()
+
+    def record_success(self):
+        was_probing = self.state == self.HALF_OPEN
+        super().record_success()
+        if was_probing:
+            self._shared(lambda: self.redis.delete(self.key))
+
+    def record_failure(self) -> bool:
+        tripped = super().record_failure()
+        if tripped:
+            self._shared(lambda: self.redis.set(self.key, "1", px=int(self.reset_timeout * 1000)))
+        return tripped
+
+
+class _Service:
+    def __init__(self, name: str, policy: ServicePolicy, clock: Callable[[], float] = time.monotonic,
+                 redis_client=None, redis_prefix: str = ""):
+        self.name = name
+        self.policy = policy
+        if redis_client is None:
+            self.bucket = TokenBucket(policy.rate, policy.burst, clock=clock)
+            self.breaker = CircuitBreaker(policy.failure_threshold, policy.reset_timeout, clock=clock)
+        else:
+            self.bucket = RedisTokenBucket(redis_client, f"{redis_prefix}:{name}:bucket", policy.rate, policy.burst,
+                                           fallback=TokenBucket(policy.rate, policy.burst, clock=clock))
+            self.breaker = RedisCircuitBreaker(redis_client, f"{redis_prefix}:{name}:open",
+                                               policy.failure_threshold, policy.reset_timeout, clock=clock)
+        self.sync_slots = threading.BoundedSemaphore(policy.max_concurrency)
+        # asyncio.Semaphore 绑定事件循环，按循环分别创建
+        self.async_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+        self.in_flight = 0
+        self.stats = {"calls": 0, "successes": 0, "failures": 0, "retries": 0, "rejected": 0}
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = self.async_slots.get(loop)
+        if sem is None:
+            sem = self.async_slots[loop] = asyncio.Semaphore(self.policy.max_concurrency)
+        return sem
+
+    def count(self, key: str, delta: int = 1):
+        with self._lock:
+            self.stats[key] += delta
+
+    def track(self, delta: int):
+        with self._lock:
+            self.in_flight += delta
+
+
+class OutboundManager:
+    """
+    所有外部服务调用的统一出口：按服务限速（令牌桶）、限制并发、
+    指数退避 + 抖动重试，并在服务持续失败时熔断、快速失败
+    """
+
+    def __init__(self, policies: Optional[Dict[str, ServicePolicy]] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep,
+                 async_sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+                 rng: Optional[random.Random] = None):
+        # clock / sleep / rng 可注入，便于用假时钟测试
+        self._clock = clock
+        self._sleep = sleep
+        self._async_sleep = async_sleep
+        self._rng = rng or random.Random()
+        self._redis = None
+        self._redis_prefix = ""
+        self._services: Dict[str, _Service] = {}
+        self._lock = threading.Lock()
+        for name, policy in (policies or {}).items():
+            self.register(name, policy)
+
+    def _new_service(self, name: str, policy: ServicePolicy) -> _Service:
+        return _Service(name, policy, clock=self._clock, redis_client=self._redis, redis_prefix=self._redis_prefix)
+
+    def register(self, name: str, policy: ServicePolicy):
+        with self._lock:
+            self._services[name] = self._new_service(name, policy)
+
+    def use_redis(self, client, prefix: str = "dropradar:outbound"):
+        """改用 Redis 共享令牌桶和熔断状态，使限速在多进程 / 多节点的 worker 集群中全局生效"""
+        with self._lock:
+            self._redis = client
+            self._redis_prefix = prefix
+            for name, svc in list(self._services.items()):
+                self._services[name] = self._new_service(name, svc.policy)
+
+    def _service(self, name: str) -> _Service:
+        with self._lock:
+            if name not in self._services:
+                self._services[name] = self._new_service(name, ServicePolicy())
+            return self._services[name]
+
+    def _backoff(self, policy: ServicePolicy, attempt: int) -> float:
+        # Full jitter: 在 [0, min(max, base * 2^attempt)] 内均匀取值
+        return self._rng.uniform(0, min(policy.backoff_max, policy.backoff_base * (2 ** attempt)))
+
+    def _before_attempt(self, svc: _Service):
+        if not svc.breaker.allow():
+            svc.count("rejected")
+            raise CircuitOpenError(svc.name, svc.breaker.retry_in())
+        svc.count("calls")
+
+    def _on_failure(self, svc: _Service, exc: Exception, passthrough: Tuple[Type[BaseException], ...]) -> bool:
+        """记录失败，返回是否值得重试"""
+        if isinstance(exc, passthrough):
+            # 业务层面的"失败"（如 WHOIS 查无此域名），服务本身是正常的
+            svc.breaker.record_success()
+            svc.count("successes")
+            return False
+
+        svc.count("failures")
+        svc.last_error = f"{type(exc).__name__}: {exc}"
+        if isinstance(exc, OutboundHTTPError) and not exc.retryable:
+            # 服务可达，只是请求被拒绝：不计入熔断
+            svc.breaker.record_success()
+            return False
+        if svc.breaker.record_failure():
+            logger.warning(f"🔌 {svc.name} 熔断 {svc.policy.reset_timeout:.0f}s: {svc.last_error}")
+        return True
+
+    def _on_success(self, svc: _Service):
+        svc.breaker.record_success()
+        svc.count("successes")
+
+    def call(self, name: str, fn: Callable[[], T],
+             passthrough: Tuple[Type[BaseException], ...] = ()) -> T:
+        """同步调用 fn；passthrough 中的异常原样抛出且不计入失败"""
+        svc = self._service(name)
+        policy = svc.policy
+
+        for attempt in range(policy.max_retries + 1):
+            self._before_attempt(svc)
+            settled = False
+            try:
+                self._sleep(svc.bucket.reserve())
+                with svc.sync_slots:
+                    svc.track(1)
+                    try:
+                        result = fn()
+                    finally:
+                        svc.track(-1)
+            except Exception as e:
+                settled = True
+                if not self._on_failure(svc, e, passthrough) or attempt == policy.max_retries:
+                    raise
+            else:
+                settled = True
+                self._on_success(svc)
+                return result
+            finally:
+                if not settled:
+                    # 取消 / 中断：不计成功也不计失败，但要归还 half_open 的探测名额
+                    svc.breaker.release_probe()
+
+            svc.count("retries")
+            self._sleep(self._backoff(policy, attempt))
+
+    async def call_async(self, name: str, fn: Callable[[], Awaitable[T]],
+                         passthrough: Tuple[Type[BaseException], ...] = ()) -> T:
+        """异步调用 fn（每次重试都会重新调用 fn 生成新的协程）"""
+        svc = self._service(name)
+        policy = svc.policy
+
+        for attempt in range(policy.max_retries + 1):
+            self._before_attempt(svc)
+            settled = False
+            try:
+                await self._async_sleep(svc.bucket.reserve())
+                async with svc.async_semaphore():
+                    svc.track(1)
+                    try:
+                        result = await fn()
+                    finally:
+                        svc.track(-1)
+            except Exception as e:
+                settled = True
+                if not self._on_failure(svc, e, passthrough) or attempt == policy.max_retries:
+                    raise
+            else:
+                settled = True
+                self._on_success(svc)
+                return result
+            finally:
+                if not settled:
+                    # asyncio.CancelledError 是 BaseException，同上
+                    svc.breaker.release_probe()
+
+            svc.count("retries")
+            await self._async_sleep(self._backoff(policy, attempt))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """各服务的限速、熔断与计数状态"""
+        with self._lock:
+            services = list(self._services.values())
+        return {
+            svc.name: {
+                "circuit": svc.breaker.state,
+                "consecutive_failures": svc.breaker.failures,
+                "retry_in": round(svc.breaker.retry_in(), 1),
+                "in_flight": svc.in_flight,
+                "tokens": round(max(svc.bucket.tokens, 0.0), 2),
+                "last_error": svc.last_error,
+                **svc.stats,
+                "policy": {
+                    "rate": svc.policy.rate,
+                    "burst": svc.policy.burst,
+                    "max_concurrency": svc.policy.max_concurrency,
+                    "max_retries": svc.policy.max_retries,
+                    "failure_threshold": svc.policy.failure_threshold,
+                    "reset_timeout": svc.policy.reset_timeout,
+                },
+            }
+            for svc in services
+        }
+
+
+# 可在 Settings 中按服务调整的字段（OUTBOUND_<SERVICE>_<FIELD> 环境变量）
+_POLICY_SETTINGS = ("rate", "burst", "max_concurrency", "max_retries", "failure_threshold", "reset_timeout")
+
+
+def policy_from_settings(service: str, **overrides) -> ServicePolicy:
+    """从 settings.outbound_<service>_* 读取服务的限速策略"""
+    fields = {f: getattr(settings, f"outbound_{service}_{f}") for f in _POLICY_SETTINGS}
+    return ServicePolicy(**{**fields, **overrides})
+
+
+DEFAULT_POLICIES = {
+    "expireddomains": policy_from_settings("expireddomains", backoff_base=1.0),
+    "openpagerank": policy_from_settings("openpagerank"),
+    "whois": policy_from_settings("whois"),
+    "bark": policy_from_settings("bark"),
+}
+
+outbound = OutboundManager(DEFAULT_POLICIES)
@@ -1,17 +1,17 @@
 import asyncio
 import logging
-import random
 import re
-import uuid
 from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 import whois
+from whois.parser import PywhoisError
 import requests
 from curl_cffi.requests import AsyncSession
 from bs4 import BeautifulSoup
 from app.core.config import settings
 from app.database import SessionLocal
 from app.models.domain import Domain
+from app.services.outbound import OutboundError, OutboundHTTPError, outbound
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -28,14 +28,31 @@ class DomainScanner:
         self.db = SessionLocal()
         self.mode = mode
 
-    def verify_expiry_date_via_whois(self, domain_name: str) -> Dict:
+    def _whois_lookup(self, domain_name: str):
+        """python-whois 会吞掉 socket 错误并返回一段提示文本，这里把它还原成失败，让熔断器能感知 WHOIS 故障"""
+        w = whois.whois(domain_name)
+        text = getattr(w, 'text', '') or ''
+        if 'Socket not responding' in text or not any(w.values()):
+            raise OutboundError(f"WHOIS 无有效响应: {text[:100]}")
+        return w
+
+    def verify_expiry_date_via_whois(self, domain_name: str, strict: bool = False) -> Dict:
         """
         验证域名的真实到期时间
         返回: {'real_expiry': datetime, 'is_expired': bool, 'is_valid': bool}
+        strict=True 时 WHOIS 服务故障（含熔断）直接抛出异常，而不是当作"未过期"返回
         """
         try:
-            w = whois.whois(domain_name)
-            
+            w = outbound.call("whois", lambda: self._whois_lookup(domain_name), passthrough=(PywhoisError,))
+        except PywhoisError:
+            return {'real_expiry': None, 'is_expired': False, 'is_valid': False}
+        except Exception as e:
+            logger.warning(f"WHOIS 查询失败 {domain_name}: {e}")
+            if strict:
+                raise
+            return {'real_expiry': None, 'is_expired': False, 'is_valid': False}
+
+        try:
             # 处理 whois 返回的日期可能是列表的情况
             expiry_date = w.expiration_date
             if isinstance(expiry_date, list):
@@ -53,6 +70,7 @@ class DomainScanner:
                 'is_valid': True
             }
         except Exception as e:
+            logger.warning(f"WHOIS 结果解析失败 {domain_name}: {e}")
             return {'real_expiry': None, 'is_expired': False, 'is_valid': False}
 
     def extract_number(self, text: str) -> int:
@@ -70,8 +88,11 @@ class DomainScanner:
         
         return 0
 
-    def batch_get_pagerank(self, domain_names: List[str]) -> Dict[str, int]:
-        """批量获取 DA 分数（通过 OpenPageRank API）"""
+    def batch_get_pagerank(self, domain_names: List[str], strict: bool = False) -> Dict[str, int]:
+        """
+        批量获取 DA 分数（通过 OpenPageRank API）
+        失败的批次不会出现在结果里（不用 0 占位）；strict=True 时直接抛出异常
+        """
         if not domain_names:
             return {}
         
@@ -85,42 +106,55 @@ class DomainScanner:
             
             params = {f"domains[{j}]": domain for j, domain in enumerate(batch)}
             
-            try:
+            def _get():
                 response = requests.get(
                     "https://openpagerank.com/api/v1.0/getPageRank",
                     params=params,
                     headers={'API-OPR': OPENPAGERANK_API_KEY},
                     timeout=10
                 )
-                
-                data = response.json()
-                
-                if data.get('status_code') == 200 and data.get('response'):
-                    for item in data['response']:
-                        domain = item['domain']
-                        page_rank = item.get('page_rank_decimal', 0)
-                        da_score = int(page_rank * 10)
-                        results[domain] = da_score
-                        logger.info(f"  ✅ {domain} → DA: {da_score}")
-                    
-                    logger.info(f"✅ 批次完成: 成功获取 {len(batch)} 个域名的 DA")
-                else:
-                    logger.warning(f"⚠️ OpenPageRank API 错误: {data}")
-                    for domain in batch:
-                        results[domain] = 0
-                
-                import time
-                time.sleep(1)
-                
+                if response.status_code != 200:
+                    raise OutboundHTTPError("openpagerank", response.status_code)
+                return response.json()
+
+            try:
+                data = outbound.call("openpagerank", _get)
             except Exception as e:
                 logger.error(f"❌ 批量获取 DA 失败: {e}")
-                for domain in batch:
-                    results[domain] = 0
+                if strict:
+                    raise
+                continue
+
+            if data.get('status_code') == 200 and data.get('response'):
+                for item in data['response']:
+                    domain = item['domain']
+                    page_rank = item.get('page_rank_decimal', 0)
+                    da_score = int(page_rank * 10)
+                    results[domain] = da_score
+                    logger.info(f"  ✅ {domain} → DA: {da_score}")
+                
+                logger.info(f"✅ 批次完成: 成功获取 {len(batch)} 个域名的 DA")
+            else:
+                logger.warning(f"⚠️ OpenPageRank API 错误: {data}")
+                if strict:
+                    raise OutboundError(f"OpenPageRank API 错误: {data}")
         
         return results
 
-    async def fetch_single_page(self, page: int, retries=3) -> List[Dict]:
-        """抓取单页数据（带重试）"""
+    async def fetch_single_page(self, page: int) -> List[Dict]:
+        """抓取并解析单页；失败返回空列表"""
+        try:
+            content = await self.fetch_page_html(page)
+        except Exception as e:
+            logger.error(f"❌ 第 {page} 页抓取失败: {e}")
+            return []
+
+        domains = self.parse_listing_page(content)
+        logger.info(f"✅ 第 {page} 页：成功解析 {len(domains)} 个域名")
+        return domains
+
+    async def fetch_page_html(self, page: int) -> str:
+        """抓取单页 HTML（限速、重试与熔断由 outbound 统一处理），失败时抛出异常"""
         url = "https://member.expireddomains.net/domains/expiredcom/"
         cookies = {
             "s_id": settings.EXPIRED_DOMAINS_COOKIE
@@ -141,56 +175,40 @@ class DomainScanner:
             "flast24": "1"
         }
 
-        for attempt in range(retries):
-            try:
-                try:
-                    async with AsyncSession() as session:
-                        resp = await session.get(url, params=params, cookies=cookies, headers=headers, timeout=30)
-                        
-                        if resp.status_code != 200:
-                            logger.warning(f"Page {page} failed with status {resp.status_code}")
-                            continue
-                            
-                        content = resp.text
-                except RuntimeError:
-                    pass
-                except Exception as e:
-                    logger.error(f"Request error on page {page}: {e}")
-                    continue
+        async def _get() -> str:
+            async with AsyncSession() as session:
+                resp = await session.get(url, params=params, cookies=cookies, headers=headers, timeout=30)
+            if resp.status_code != 200:
+                raise OutboundHTTPError("expireddomains", resp.status_code)
+            return resp.text
 
-                domains = []
-                soup = BeautifulSoup(content, 'html.parser')
-                rows = soup.select('table.base1 tbody tr')
-                
-                for row in rows:
-                    cols = row.find_all('td')
-                    if len(cols) < 2:
-                        continue
-                        
-                    domain_name = cols[0].get_text(strip=True)
-                    
-                    bl = 0
-                    try:
-                        bl_text = cols[2].get_text(strip=True)
-                        bl = self.extract_number(bl_text)
-                    except:
-                        pass
+        return await outbound.call_async("expireddomains", _get)
 
-                    domains.append({
-                        "name": domain_name,
-                        "backlinks": bl,
-                        "da_score": 0,
-                        "status": "pending"
-                    })
+    def parse_listing_page(self, content: str) -> List[Dict]:
+        """解析 ExpiredDomains 列表页 HTML"""
+        domains = []
+        soup = BeautifulSoup(content, 'html.parser')
+        rows = soup.select('table.base1 tbody tr')
+        
+        for row in rows:
+            cols = row.find_all('td')
+            if len(cols) < 2:
+                continue
                 
-                logger.info(f"✅ 第 {page} 页：成功解析 {len(domains)} 个域名")
-                return domains
+            domain_name = cols[0].get_text(strip=True)
+            
+            bl = 0
+            if len(cols) > 2:
+                bl = self.extract_number(cols[2].get_text(strip=True))
 
-            except Exception as e:
-                logger.error(f"Attempt {attempt+1} failed for page {page}: {str(e)}")
-                await asyncio.sleep(2)
+            domains.append({
+                "name": domain_name,
+                "backlinks": bl,
+                "da_score": 0,
+                "status": "pending"
+            })
         
-        return []
+        return domains
 
     async def fetch_expireddomains_multi_pages(self, pages=4) -> List[Dict]:
         """并发抓取多页"""
@@ -235,49 +253,15 @@ class DomainScanner:
         
         return all_domains
 
-    def generate_mock_domains(self, count=20) -> List[Dict]:
-        """B层：生成模拟的高质量域名（确保唯一）"""
-        logger.info(f"⚠️ [B 层] 触发降级：生成 {count} 个模拟域名")
-        
-        TECH_KEYWORDS = ["ai", "gpt", "gemini", "claude", "quantum", "neural", "crypto", "defi", "metaverse"]
-        PREFIXES = ["super", "ultra", "mega", "next", "smart", "auto", "hyper"]
-        SUFFIXES = ["hub", "lab", "flow", "cloud", "stack", "forge", "sphere"]
-        
-        mock_domains = []
-        
-        for i in range(count):
-            # 使用 UUID 确保唯一性
-            unique_suffix = str(uuid.uuid4())[:8]
-            
-            pattern = random.choice([
-                f"{random.choice(TECH_KEYWORDS)}-{unique_suffix}",
-                f"{random.choice(PREFIXES)}{random.choice(TECH_KEYWORDS)}-{unique_suffix}",
-                f"{random.choice(TECH_KEYWORDS)}{random.choice(SUFFIXES)}-{unique_suffix}"
-            ])
-            
-            tld = random.choice([".com", ".ai", ".io", ".net"])
-            d_name = pattern + tld
-            
-            mock_domains.append({
-                "name": d_name,
-                "da_score": random.randint(25, 65),
-                "backlinks": random.randint(50, 500),
-                "status": "mock",  # 标记为模拟的
-                "drop_date": datetime.now() + timedelta(days=random.randint(1, 30))
-            })
-            
-            logger.info(f"  🎭 生成: {d_name} (DA: {mock_domains[-1]['da_score']})")
-            
-        return mock_domains
-
     async def scan(self):
-        """主扫描逻辑：A -> B 降级"""
-        logger.info("🚀 开始二层降级扫描...")
+        """主扫描逻辑：抓取 -> DA 评分 -> WHOIS 验证"""
+        logger.info("🚀 开始扫描...")
         
         final_results = []
+        observations = []
         
-        # --- A 层：真实爬虫（100个域名全存库）---
-        logger.info("🕷️ [A 层] 抓取 ExpiredDomains.net")
+        # 真实爬虫（100个域名全存库）
+        logger.info("🕷️ 抓取 ExpiredDomains.net")
         raw_domains = await self.fetch_expireddomains_multi_pages(pages=4)
         
         if raw_domains:
@@ -288,10 +272,13 @@ class DomainScanner:
             da_scores = self.batch_get_pagerank(domain_names)
             
             for d in top_20:
-                d['da_score'] = da_scores.get(d['name'], 0)
+                if d['name'] in da_scores:
+                    d['da_score'] = da_scores[d['name']]
+                else:
+                    d.pop('da_score', None)  # 评分失败：不带 DA，入库时保留原值
                 
             # 2. 按 DA 排序取 Top 5
-            top_domains = sorted(top_20, key=lambda x: x['da_score'], reverse=True)[:5]
+            top_domains = sorted(top_20, key=lambda x: x.get('da_score', 0), reverse=True)[:5]
             
             # 3. WHOIS 验证
             logger.info("🔍 对 Top 5 进行 WHOIS 验证...")
@@ -309,17 +296,19 @@ class DomainScanner:
                     logger.info(f"❌ 已续费: {d['name']} (到期日: {verify_res.get('real_expiry')})")
             
             final_results.extend(valid_a_domains)
+            
+            # 4. 本次抓到的每个域名都记一条快照：外链全部都有，DA 只有评分过的 Top 20 才有
+            scored = {name for name in domain_names if name in da_scores}
+            for d in raw_domains:
+                obs = {"name": d['name'], "backlinks": d.get('backlinks', 0), "status": d.get('status')}
+                if d['name'] in scored:
+                    obs["da_score"] = da_scores[d['name']]
+                observations.append(obs)
         
-        # --- B 层：模拟数据（如果 A 层结果不足）---
-        if len(final_results) < 2:
-            logger.info("⚠️ A 层有效数据不足，启动 B 层补位...")
-            mock_count = 8 if len(final_results) == 0 else (5 - len(final_results))
-            mock_data = self.generate_mock_domains(count=mock_count)
-            final_results.extend(mock_data)
-
         # 返回字典格式，由 endpoints.py 统一入库
         logger.info(f"✅ 扫描完成，返回 {len(final_results)} 个域名（待展示）")
         return {
             "all_domains": final_results,
-            "top_5": final_results[:5]
+            "top_5": final_results[:5],
+            "observations": observations
         }
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+合成数据生成器（仅用于压测/开发，不参与生产扫描）
+
+按固定 seed 向量化批量生成逼真的 Domain 行和 ExpiredDomains 列表页 HTML，
+用于压测数据库、API 分页、统计和评分路径。
+"""
+import logging
+from datetime import date
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.domain import Domain
+
+logger = logging.getLogger(__name__)
+
+KEYWORDS = np.array([
+    "ai", "gpt", "gemini", "claude", "quantum", "neural", "crypto", "defi", "meta",
+    "data", "cloud", "pay", "shop", "health", "travel", "green", "solar", "home",
+    "game", "media", "learn", "code", "dev", "bio", "fin", "food", "pet", "auto",
+])
+PREFIXES = np.array(["", "", "", "super", "ultra", "mega", "next", "smart", "my", "get", "the", "hyper"])
+SUFFIXES = np.array(["", "", "", "hub", "lab", "flow", "stack", "forge", "ly", "io", "pro", "zone", "hq"])
+TLDS = np.array([".com", ".net", ".org", ".io", ".ai", ".co"])
+TLD_WEIGHTS = np.array([0.6, 0.12, 0.1, 0.08, 0.06, 0.04])
+STATUSES = np.array(["scraped", "pending", "available", "expired_confirmed"])
+STATUS_WEIGHTS = np.array([0.7, 0.15, 0.1, 0.05])
+
+STEMS = np.add.outer(np.add.outer(PREFIXES.astype(object), KEYWORDS.astype(object)), SUFFIXES.astype(object)).ravel()
+STEM_LENGTHS = np.array([len(stem) for stem in STEMS])
+TLD_LENGTHS = np.array([len(tld) for tld in TLDS])
+HEX_POWERS = 16 ** np.arange(1, 16, dtype=np.int64)
+
+# drop_date 围绕固定日期生成，同一 seed 任何一天跑出来都一样
+SYNTHETIC_BASE_DATE = date(2025, 1, 1)
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def generate_domain_frame(count: int, seed: int = 0, start_index: int = 0,
+                          rng: Optional[np.random.Generator] = None,
+                          base_date: date = SYNTHETIC_BASE_DATE) -> pd.DataFrame:
+    """
+    向量化生成 count 行 Domain 数据
+    :param start_index: 名称唯一后缀的起始编号，分块生成时递增即可保证全局唯一
+    :param base_date: drop_date 在其前后 30 天内分布
+    """
+    rng = rng or np.random.default_rng(seed)
+
+    # 在预先组合好的词干表里按下标取值，避免逐元素拼接 numpy 字符串
+    stem_idx = rng.integers(0, len(STEMS), count)
+    tld_idx = rng.choice(len(TLDS), count, p=TLD_WEIGHTS)
+    ids = np.arange(start_index, start_index + count)
+    hex_ids = np.array([format(i, "x") for i in ids.tolist()], dtype=object)
+    name = STEMS[stem_idx] + "-" + hex_ids + TLDS[tld_idx].astype(object)
+    hex_len = np.searchsorted(HEX_POWERS, ids, side="right") + 1
+    length = STEM_LENGTHS[stem_idx] + 1 + hex_len + TLD_LENGTHS[tld_idx]  # 与 Domain.length 一致：完整域名长度
+
+    # 外链呈长尾分布，DA 与外链数的对数正相关
+    backlinks = np.rint(rng.lognormal(mean=4.0, sigma=1.6, size=count)).astype(np.int64)
+    da_score = np.clip(np.rint(np.log1p(backlinks) * 6 + rng.normal(0, 6, count)), 0, 100).astype(np.int64)
+    referring_domains = np.rint(backlinks * rng.uniform(0.05, 0.4, count)).astype(np.int64)
+    spam_score = np.clip(np.rint(rng.gamma(2.0, 6.0, count)), 0, 100).astype(np.int64)
+    domain_age = rng.integers(0, 25, count)
+    wikipedia_links = rng.poisson(0.2 + da_score / 40.0)
+    bids = rng.poisson(da_score / 10.0)
+    price = np.where(bids > 0, np.rint(rng.lognormal(3.5, 1.0, count) * (1 + bids)), 0).astype(np.int64)
+    quality_score = np.round(
+        np.clip(da_score * 0.6 + np.log1p(referring_domains) * 4 - spam_score * 0.3 + domain_age * 0.5, 0, 100), 2
+    )
+    drop_date = pd.Timestamp(base_date) + pd.to_timedelta(rng.integers(-30, 31, count), unit="D")
+
+    return pd.DataFrame({
+        "name": name,
+        "tld": TLDS[tld_idx].astype(object),
+        "length": length,
+        "da_score": da_score,
+        "backlinks": backlinks,
+        "referring_domains": referring_domains,
+        "spam_score": spam_score,
+        "price": price,
+        "bids": bids,
+        "domain_age": domain_age,
+        "drop_date": drop_date.date,
+        "wikipedia_links": wikipedia_links,
+        "quality_score": quality_score,
+        "status": STATUSES[rng.choice(len(STATUSES), count, p=STATUS_WEIGHTS)].astype(object),
+        "is_new": rng.random(count) < 0.05,
+        "notified": False,
+    })
+
+
+def iter_domain_frames(count: int, seed: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       start_index: int = 0, base_date: date = SYNTHETIC_BASE_DATE) -> Iterator[pd.DataFrame]:
+    """分块生成，内存占用只与 chunk_size 有关；同一 (count, seed, chunk_size, base_date) 结果可复现"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, chunk_size):
+        yield generate_domain_frame(
+            min(chunk_size, count - start), start_index=start_index + start, rng=rng, base_date=base_date
+        )
+
+
+def bulk_load_domains(db: Session, count: int, seed: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      start_index: int = 0, base_date: date = SYNTHETIC_BASE_DATE) -> int:
+    """
+    批量写入 count 行合成 Domain，每块提交一次；返回写入行数
+    :param start_index: 向已有合成数据的库追加时，传入已写入的行数以避免域名重复
+    """
+    written = 0
+    for frame in iter_domain_frames(count, seed=seed, chunk_size=chunk_size, start_index=start_index,
+                                    base_date=base_date):
+        # to_dict("records") 会把 numpy 标量转回 Python 原生类型
+        db.execute(insert(Domain), frame.to_dict("records"))
+        db.commit()
+        written += len(frame)
+        logger.info(f"🧪 已写入 {written}/{count} 个合成域名")
+    return written
+
+
+def _format_backlinks(values: np.ndarray) -> np.ndarray:
+    """按 ExpiredDomains 的展示习惯格式化外链数（1,992 / 18.3K）"""
+    return np.array(
+        [f"{v / 1000:.1f}K" if v >= 10_000 else f"{v:,}" for v in values.tolist()], dtype=object
+    )
+
+
+def render_listing_page(frame: pd.DataFrame) -> str:
+    """渲染一页与 ExpiredDomains 列表结构一致的 HTML（table.base1 tbody tr）"""
+    backlinks = _format_backlinks(frame["backlinks"].to_numpy())
+    rows = "\n".join(
+        f'<tr><td class="field_domain"><a>{name}</a></td><td>{age}</td><td class="field_bl">{bl}</td>'
+        f'<td>{rd}</td><td>{status}</td></tr>'
+        for name, age, bl, rd, status in zip(
+            frame["name"], frame["domain_age"], backlinks, frame["referring_domains"], frame["status"]
+        )
+    )
+    return (
+        '<html><body><table class="base1">'
+        "<thead><tr><th>Domain</th><th>ABY</th><th>BL</th><th>DP</th><th>Status</th></tr></thead>"
+        f"<tbody>\n{rows}\n</tbody></table></body></html>"
+    )
+
+
+def generate_listing_pages(pages: int, seed: int = 0, per_page: int = 25,
+                           base_date: date = SYNTHETIC_BASE_DATE) -> Iterator[str]:
+    """生成 pages 页列表 HTML，可直接喂给 DomainScanner 的页面解析逻辑"""
+    for frame in iter_domain_frames(pages * per_page, seed=seed, chunk_size=per_page, base_date=base_date):
+        yield render_listing_page(frame)
@@ -0,0 +1,276 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+
+@dataclass
+class Job:
+    type: str  # fetch_pages / score / verify
+    scan_id: str
+    payload: Dict
+    id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    attempts: int = 0  # 租约过期被重新入队的次数
+
+    def to_json(self) -> str:
+        return json.dumps(self.__dict__)
+
+    @classmethod
+    def from_json(cls, raw) -> "Job":
+        return cls(**json.loads(raw))
+
+
+class WorkQueue:
+    """
+    扫描任务队列接口（至少一次投递）：
+    - reserve() 取出任务并加租约，ack() 之前任务对其他 worker 不可见；执行中用 renew() 续租
+    - 租约过期未 ack 的任务由 requeue_expired() 重新入队；已 ack 的任务即使被重新入队也会被跳过
+    - put_unique() 原子地"按域名去重 + 入队"：每个 (scan_id, stage, 域名) 只会进入一个任务，
+      同一任务被重复投递时再次调用也不会产生重复的下游任务
+    - try_lock() 是不可重入的 TTL 锁，用于全集群只跑一次的周期任务
+    """
+
+    lease_seconds: float
+
+    def put(self, job: Job) -> str:
+        raise NotImplementedError
+
+    def put_unique(self, job: Job, stage: str, ttl: int) -> Optional[Job]:
+        """只保留 job.payload["domains"] 中本阶段首次出现的域名并入队；全部重复则返回 None"""
+        raise NotImplementedError
+
+    def reserve(self, timeout: float = 1.0) -> Optional[Job]:
+        raise NotImplementedError
+
+    def renew(self, job_id: str) -> bool:
+        raise NotImplementedError
+
+    def ack(self, job_id: str):
+        raise NotImplementedError
+
+    def requeue_expired(self) -> int:
+        raise NotImplementedError
+
+    def try_lock(self, key: str, ttl: int) -> bool:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+def _marker(job: Job, stage: str, name: str) -> str:
+    return f"{job.scan_id}:{stage}:{name}"
+
+
+class LocalWorkQueue(WorkQueue):
+    """进程内的队列替身，语义与 RedisWorkQueue 一致；用于单机调试和测试（多线程 worker）"""
+
+    def __init__(self, lease_seconds: float = 300.0, clock=time.monotonic):
+        self.lease_seconds = lease_seconds
+        self._clock = clock
+        self._ready: deque = deque()
+        self._jobs: Dict[str, Job] = {}
+        self._leases: Dict[str, float] = {}
+        self._markers: Dict[str, float] = {}
+        self._cond = threading.Condition()
+
+    def _set_nx(self, key: str, ttl: float) -> bool:
+        now = self._clock()
+        if self._markers.get(key, 0) > now:
+            return False
+        self._markers[key] = now + ttl
+        return True
+
+    def put(self, job: Job) -> str:
+        with self._cond:
+            self._jobs[job.id] = job
+            self._ready.appendleft(job.id)
+            self._cond.notify()
+        return job.id
+
+    def put_unique(self, job: Job, stage: str, ttl: int) -> Optional[Job]:
+        with self._cond:
+            kept = [d for d in job.payload["domains"] if self._set_nx(_marker(job, stage, d["name"]), ttl)]
+            if not kept:
+                return None
+            job.payload = {**job.payload, "domains": kept}
+            self._jobs[job.id] = job
+            self._ready.appendleft(job.id)
+            self._cond.notify()
+            return job
+
+    def reserve(self, timeout: float = 1.0) -> Optional[Job]:
+        with self._cond:
+            if not self._ready:
+                self._cond.wait(timeout)
+            while self._ready:
+                job_id = self._ready.pop()
+                if job_id in self._jobs:  # 已被 ack 的任务直接丢弃
+                    self._leases[job_id] = self._clock() + self.lease_seconds
+                    return self._jobs[job_id]
+            return None
+
+    def renew(self, job_id: str) -> bool:
+        with self._cond:
+            if job_id not in self._leases:
+                return False
+            self._leases[job_id] = self._clock() + self.lease_seconds
+            return True
+
+    def ack(self, job_id: str):
+        with self._cond:
+            self._leases.pop(job_id, None)
+            self._jobs.pop(job_id, None)
+            try:
+                self._ready.remove(job_id)
+            except ValueError:
+                pass
+
+    def requeue_expired(self) -> int:
+        now = self._clock()
+        with self._cond:
+            expired = [job_id for job_id, until in self._leases.items() if until <= now]
+            for job_id in expired:
+                del self._leases[job_id]
+                self._jobs[job_id].attempts += 1
+                self._ready.appendleft(job_id)
+            if expired:
+                self._cond.notify_all()
+        return len(expired)
+
+    def try_lock(self, key: str, ttl: int) -> bool:
+        with self._cond:
+            return self._set_nx(f"lock:{key}", ttl)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {"ready": len(self._ready), "leased": len(self._leases)}
+
+
+# 原子地出队并登记租约；跳过数据已被 ack 删除的任务
+_RESERVE_LUA = """
+while true do
+    local job_id = redis.call('RPOP', KEYS[1])
+    if not job_id then return nil end
+    local raw = redis.call('HGET', KEYS[3], job_id)
+    if raw then
+        redis.call('ZADD', KEYS[2], ARGV[1], job_id)
+        return raw
+    end
+end
+"""
+
+# 只给仍持有租约的任务续期
+_RENEW_LUA = """
+if redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+    redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# 原子地把过期租约放回就绪队列并累加重试次数
+_REQUEUE_LUA = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, job_id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], job_id)
+    local raw = redis.call('HGET', KEYS[3], job_id)
+    if raw then
+        local job = cjson.decode(raw)
+        job['attempts'] = job['attempts'] + 1
+        redis.call('HSET', KEYS[3], job_id, cjson.encode(job))
+        redis.call('LPUSH', KEYS[1], job_id)
+    end
+end
+return #expired
+"""
+
+# 逐个域名 SET NX 去重标记，只把首次出现的域名写进任务再入队，全程原子
+_PUT_UNIQUE_LUA = """
+local job = cjson.decode(ARGV[3])
+local kept = {}
+for _, d in ipairs(job['payload']['domains']) do
+    if redis.call('SET', ARGV[4] .. d['name'], '1', 'NX', 'EX', ARGV[2]) then
+        table.insert(kept, d)
+    end
+end
+if #kept == 0 then return nil end
+job['payload']['domains'] = kept
+local raw = cjson.encode(job)
+redis.call('HSET', KEYS[3], ARGV[1], raw)
+redis.call('LPUSH', KEYS[1], ARGV[1])
+return raw
+"""
+
+
+class RedisWorkQueue(WorkQueue):
+    """基于 Redis 的共享队列，可跨进程、跨节点使用"""
+
+    def __init__(self, client, prefix: str = "dropradar", lease_seconds: float = 300.0,
+                 poll_interval: float = 0.2):
+        self.redis = client
+        self.prefix = prefix
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._ready_key = f"{prefix}:jobs:ready"
+        self._leased_key = f"{prefix}:jobs:leased"
+        self._data_key = f"{prefix}:jobs:data"
+        self._reserve = client.register_script(_RESERVE_LUA)
+        self._renew = client.register_script(_RENEW_LUA)
+        self._requeue = client.register_script(_REQUEUE_LUA)
+        self._put_unique = client.register_script(_PUT_UNIQUE_LUA)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisWorkQueue":
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    @property
+    def _keys(self):
+        return [self._ready_key, self._leased_key, self._data_key]
+
+    def put(self, job: Job) -> str:
+        pipe = self.redis.pipeline()
+        pipe.hset(self._data_key, job.id, job.to_json())
+        pipe.lpush(self._ready_key, job.id)
+        pipe.execute()
+        return job.id
+
+    def put_unique(self, job: Job, stage: str, ttl: int) -> Optional[Job]:
+        raw = self._put_unique(
+            keys=self._keys,
+            args=[job.id, ttl, job.to_json(), f"{self.prefix}:marker:{job.scan_id}:{stage}:"],
+        )
+        return Job.from_json(raw) if raw else None
+
+    def reserve(self, timeout: float = 1.0) -> Optional[Job]:
+        deadline = time.monotonic() + timeout
+        while True:
+            raw = self._reserve(keys=self._keys, args=[time.time() + self.lease_seconds])
+            if raw:
+                return Job.from_json(raw)
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def renew(self, job_id: str) -> bool:
+        return bool(self._renew(keys=self._keys, args=[job_id, time.time() + self.lease_seconds]))
+
+    def ack(self, job_id: str):
+        pipe = self.redis.pipeline()
+        pipe.zrem(self._leased_key, job_id)
+        pipe.hdel(self._data_key, job_id)
+        pipe.lrem(self._ready_key, 0, job_id)
+        pipe.execute()
+
+    def requeue_expired(self) -> int:
+        return int(self._requeue(keys=self._keys, args=[time.time()]))
+
+    def try_lock(self, key: str, ttl: int) -> bool:
+        return bool(self.redis.set(f"{self.prefix}:lock:{key}", "1", nx=True, ex=ttl))
+
+    def stats(self) -> Dict[str, int]:
+        return {"ready": self.redis.llen(self._ready_key), "leased": self.redis.zcard(self._leased_key)}
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database import SessionLocal, dialect_insert
+from app.models.domain import Domain
+from app.services.history import compact_history, record_observations
+from app.services.scanner import DomainScanner
+from app.services.work_queue import Job, WorkQueue
+
+logger = logging.getLogger(__name__)
+
+
+def _chunks(items: List, size: int):
+    for i in range(0, len(items), max(1, size)):
+        yield items[i:i + size]
+
+
+def _unique_by_name(domains: Iterable[Dict]) -> List[Dict]:
+    seen = set()
+    unique = []
+    for d in domains:
+        if d["name"] not in seen:
+            seen.add(d["name"])
+            unique.append(d)
+    return unique
+
+
+def merge_domains(db: Session, rows: List[Dict], insert_only: Iterable[str] = ()) -> int:
+    """
+    按域名批量 upsert（INSERT ... ON CONFLICT (name) DO UPDATE），不提交事务
+    只更新行里出现的字段，多个 worker 并发写同一域名也不会冲突；
+    insert_only 中的字段只在插入新行时写入，已有行保留原值（如已确认的 status）
+    """
+    # 同一条多值 INSERT 的行必须字段一致，按字段集合分组
+    groups: Dict[tuple, List[Dict]] = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+
+    for columns, group in groups.items():
+        for batch in _chunks(group, settings.history_batch_size):
+            stmt = dialect_insert(db, Domain).values([{**r, "is_new": True} for r in batch])
+            updates = {c: stmt.excluded[c] for c in columns if c != "name" and c not in insert_only}
+            if updates:
+                stmt = stmt.on_conflict_do_update(index_elements=[Domain.name], set_=updates)
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=[Domain.name])
+            db.execute(stmt)
+    return len(rows)
+
+
+def submit_scan(queue: WorkQueue, pages: int, pages_per_job: Optional[int] = None) -> Dict:
+    """把一次扫描按页码区间切分成抓取任务入队"""
+    scan_id = str(uuid.uuid4())
+    per_job = pages_per_job or settings.worker_pages_per_job
+    jobs = 0
+    for start in range(1, pages + 1, per_job):
+        queue.put(Job("fetch_pages", scan_id, {"pages": list(range(start, min(start + per_job, pages + 1)))}))
+        jobs += 1
+    logger.info(f"📤 提交分布式扫描 {scan_id}: {pages} 页 -> {jobs} 个抓取任务")
+    return {"scan_id": scan_id, "pages": pages, "jobs": jobs}
+
+
+class ScanWorker:
+    """
+    从共享队列领取任务的扫描 worker，流水线为：
+    fetch_pages（抓取+解析）-> score（批量 DA）-> verify（WHOIS）
+
+    下一阶段任务通过 queue.put_unique 原子地"按域名去重 + 入队"，同一次扫描内每个域名每阶段
+    只会进入一个任务，任务被重复投递也不会产生重复的下游任务；结果通过 merge_domains 批量写库。
+    抓取、评分或 WHOIS 失败直接抛出异常，任务不 ack，等租约过期后重试。
+    每个域名每次扫描只在其最后一个阶段写一条历史快照：进入 verify 的域名由 verify 写，其余由 score 写。
+    """
+
+    def __init__(self, queue: WorkQueue, scanner: Optional[DomainScanner] = None,
+                 db: Optional[Session] = None):
+        self.queue = queue
+        self.scanner = scanner or DomainScanner()
+        self.db = db or SessionLocal()
+        self.handlers = {
+            "fetch_pages": self.handle_fetch_pages,
+            "score": self.handle_score,
+            "verify": self.handle_verify,
+        }
+
+    def _enqueue(self, job: Job, stage: str, domains: List[Dict], batch_size: int) -> int:
+        """按批次把域名幂等地放进下一阶段，返回新入队的域名数"""
+        queued = 0
+        for batch in _chunks(domains, batch_size):
+            put = self.queue.put_unique(Job(stage, job.scan_id, {"domains": batch}), stage, settings.worker_claim_ttl)
+            queued += len(put.payload["domains"]) if put else 0
+        return queued
+
+    def handle_fetch_pages(self, job: Job):
+        async def fetch_all():
+            return await asyncio.gather(*[self.scanner.fetch_page_html(p) for p in job.payload["pages"]])
+
+        # 任一页失败都会抛出异常，整个任务重试（已入队的域名由 put_unique 去重）
+        pages = asyncio.run(fetch_all())
+        domains = _unique_by_name(
+            {"name": d["name"], "backlinks": d.get("backlinks", 0)}
+            for content in pages for d in self.scanner.parse_listing_page(content)
+        )
+
+        merge_domains(self.db, [{**d, "status": "scraped"} for d in domains], insert_only={"status"})
+        queued = self._enqueue(job, "score", domains, settings.worker_score_batch)
+        logger.info(f"🕷️ 页 {job.payload['pages']}: 解析 {len(domains)} 个，新入队 {queued} 个")
+
+    def handle_score(self, job: Job):
+        domains = job.payload["domains"]
+        da_scores = self.scanner.batch_get_pagerank([d["name"] for d in domains], strict=True)
+
+        # API 没返回的域名不写 DA，保留库里已有的分数
+        scored = [{**d, "da_score": da_scores[d["name"]]} for d in domains if d["name"] in da_scores]
+        unscored = [d for d in domains if d["name"] not in da_scores]
+        merge_domains(self.db, scored + unscored)
+
+        candidates = [d for d in scored if d["da_score"] >= settings.worker_verify_min_da]
+        self._enqueue(job, "verify", candidates, settings.worker_verify_batch)
+
+        # 进入 verify 的域名由 verify 阶段写快照
+        verifying = {d["name"] for d in candidates}
+        record_observations(self.db, [d for d in scored + unscored if d["name"] not in verifying],
+                            scan_id=job.scan_id)
+
+    def handle_verify(self, job: Job):
+        observations = []
+        confirmed = []
+        for d in job.payload["domains"]:
+            # WHOIS 故障时抛出异常，任务不 ack，等租约过期后重试
+            verify_res = self.scanner.verify_expiry_date_via_whois(d["name"], strict=True)
+            if verify_res["is_expired"]:
+                d = {**d, "status": "expired_confirmed", "drop_date": verify_res["real_expiry"]}
+                confirmed.append(d)
+            observations.append(d)
+        merge_domains(self.db, confirmed)
+        record_observations(self.db, observations, scan_id=job.scan_id)
+        logger.info(f"🔍 WHOIS: {len(job.payload['domains'])} 个中确认过期 {len(confirmed)} 个")
+
+    def _give_up(self, job: Job):
+        """放弃任务；verify 任务仍补写快照，避免这些域名在本次扫描中没有记录"""
+        logger.error(f"☠️ 任务 {job.type} {job.id} 已重试 {job.attempts} 次，放弃")
+        if job.type == "verify":
+            try:
+                record_observations(self.db, job.payload["domains"], scan_id=job.scan_id)
+                self.db.commit()
+            except Exception as e:
+                self.db.rollback()
+                logger.error(f"❌ 补写快照失败: {e}")
+        self.queue.ack(job.id)
+
+    def _heartbeat(self, job: Job, done: threading.Event):
+        """任务执行期间定期续租，防止长任务被重新投递给其他 worker"""
+        interval = max(self.queue.lease_seconds / 3, 0.01)
+        while not done.wait(interval):
+            try:
+                if not self.queue.renew(job.id):
+                    return
+            except Exception as e:
+                logger.warning(f"⚠️ 任务 {job.id} 续租失败: {e}")
+
+    def process(self, job: Job) -> bool:
+        """执行单个任务；成功才 ack，失败则等租约过期后被重新投递"""
+        if job.attempts >= settings.worker_max_attempts:
+            self._give_up(job)
+            return False
+
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, done), daemon=True)
+        heartbeat.start()
+        try:
+            self.handlers[job.type](job)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"❌ 任务 {job.type} {job.id} 失败（第 {job.attempts + 1} 次）: {e}")
+            return False
+        finally:
+            done.set()
+            heartbeat.join()
+
+        self.queue.ack(job.id)
+        return True
+
+    def maybe_compact_history(self) -> bool:
+        """全集群每 history_compact_interval 秒只有一个 worker 执行历史压缩"""
+        if not self.queue.try_lock("compact_history", settings.history_compact_interval):
+            return False
+        try:
+            stats = compact_history(self.db)
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"❌ 历史压缩失败: {e}")
+            return False
+        logger.info(f"🗜️ 历史压缩完成: {stats}")
+        return True
+
+    def run(self, stop: Optional[threading.Event] = None, exit_when_idle: bool = False,
+            poll_timeout: float = 1.0):
+        """持续领取任务，直到 stop 被设置（或队列空闲且 exit_when_idle）"""
+        logger.info("👷 worker 启动")
+        try:
+            while not (stop and stop.is_set()):
+                try:
+                    self.maybe_compact_history()
+                    self.queue.requeue_expired()
+                    job = self.queue.reserve(timeout=poll_timeout)
+                    if job is None:
+                        if exit_when_idle and not self.queue.stats()["leased"]:
+                            break
+                        continue
+                except Exception as e:
+                    # 队列暂时不可用（如 Redis 断连）时不退出进程，稍后重试
+                    logger.error(f"❌ 队列操作失败: {e}")
+                    time.sleep(poll_timeout)
+                    continue
+                self.process(job)
+        finally:
+            self.db.close()
+        logger.info("👷 worker 退出")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Synthetic load-test data generator (never run against production)
+Usage:
+    python generate_synthetic.py --domains 2000000 --seed 42
+    python generate_synthetic.py --pages 400 --out ./synthetic_pages
+"""
+import argparse
+import os
+from datetime import date
+
+from app.database import SessionLocal, init_db
+from app.services.synthetic import (
+    DEFAULT_CHUNK_SIZE, SYNTHETIC_BASE_DATE, bulk_load_domains, generate_listing_pages
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic DropRadar data")
+    parser.add_argument("--domains", type=int, default=0, help="number of Domain rows to insert")
+    parser.add_argument("--pages", type=int, default=0, help="number of listing HTML pages to write")
+    parser.add_argument("--out", default="synthetic_pages", help="output directory for HTML pages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--offset", type=int, default=0, help="first name index, to append without collisions")
+    parser.add_argument("--base-date", type=date.fromisoformat, default=SYNTHETIC_BASE_DATE,
+                        help="drop dates are spread around this day (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    if args.domains:
+        print(f"🧪 Inserting {args.domains} synthetic domains (seed={args.seed})...")
+        init_db()
+        db = SessionLocal()
+        try:
+            written = bulk_load_domains(
+                db, args.domains, seed=args.seed, chunk_size=args.chunk_size, start_index=args.offset,
+                base_date=args.base_date,
+            )
+            print(f"✅ Inserted {written} domains")
+        finally:
+            db.close()
+
+    if args.pages:
+        os.makedirs(args.out, exist_ok=True)
+        for i, html in enumerate(generate_listing_pages(args.pages, seed=args.seed, base_date=args.base_date), start=1):
+            with open(os.path.join(args.out, f"page_{i:05d}.html"), "w", encoding="utf-8") as f:
+                f.write(html)
+        print(f"✅ Wrote {args.pages} listing pages to {args.out}")
@@ -0,0 +1,20 @@
+import os
+import tempfile
+
+import pytest
+
+# app.database 在导入时就创建引擎，测试统一用临时 SQLite 文件库
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/dropradar-test.db")
+
+
+@pytest.fixture
+def db():
+    """每个测试一份空表的 Session"""
+    from app.database import Base, SessionLocal, engine
+    import app.models  # noqa: F401  注册所有表
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,177 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.models import DomainDailyRollup, DomainObservation
+from app.services.history import _as_date, compact_history, get_domain_history, get_top_movers, record_observations
+
+NOW = datetime(2025, 3, 20, 12, 0)
+OLD = datetime(2025, 3, 1, 9, 0)  # 早于原始保留期（7 天）
+
+
+def observe(db, observed_at, scan_id=None, **metrics):
+    """每个关键字参数是一个域名 -> (da_score, backlinks)"""
+    rows = [{"name": name, "da_score": da, "backlinks": bl} for name, (da, bl) in metrics.items()]
+    record_observations(db, rows, scan_id=scan_id, observed_at=observed_at)
+    db.commit()
+
+
+def rollups(db):
+    return {(r.domain_name, r.day): r for r in db.scalars(select(DomainDailyRollup))}
+
+
+def raw_count(db):
+    return db.scalar(select(func.count()).select_from(DomainObservation))
+
+
+def test_same_scan_and_domain_recorded_once(db):
+    record_observations(db, [{"name": "a.com", "backlinks": 1}, {"name": "a.com", "backlinks": 2}], scan_id="s1")
+    record_observations(db, [{"name": "a.com", "backlinks": 3}], scan_id="s1")
+    record_observations(db, [{"name": "a.com", "backlinks": 4}], scan_id="s2")
+    db.commit()
+
+    rows = {o.scan_id: o.backlinks for o in db.scalars(select(DomainObservation))}
+    assert rows == {"s1": 2, "s2": 4}  # 同批内取最后一条，已写过的跳过
+
+
+def test_compaction_rolls_up_old_snapshots(db):
+    observe(db, OLD, **{"a.com": (10, 100)})
+    observe(db, OLD + timedelta(hours=2), **{"a.com": (20, 300)})
+    observe(db, NOW - timedelta(hours=1), **{"a.com": (30, 500)})  # 仍在保留期内
+
+    stats = compact_history(db, now=NOW)
+    db.commit()
+
+    assert stats == {"compacted": 2, "rollups": 1, "expired": 0}
+    rollup = rollups(db)[("a.com", OLD.date())]
+    assert (rollup.samples, rollup.da_samples) == (2, 2)
+    assert (rollup.da_min, rollup.da_max, rollup.da_avg) == (10, 20, 15.0)
+    assert (rollup.backlinks_max, rollup.backlinks_avg) == (300, 200.0)
+    assert raw_count(db) == 1
+
+
+def test_recompaction_is_idempotent(db):
+    observe(db, OLD, **{"a.com": (10, 100)})
+    compact_history(db, now=NOW)
+    db.commit()
+
+    assert compact_history(db, now=NOW) == {"compacted": 0, "rollups": 0, "expired": 0}
+    db.commit()
+    assert rollups(db)[("a.com", OLD.date())].samples == 1
+
+
+def test_late_snapshots_merge_into_existing_rollup(db):
+    observe(db, OLD, **{"a.com": (10, 100)})
+    compact_history(db, now=NOW)
+    db.commit()
+
+    # 同一天又有三条快照（例如从别处导入），按样本数加权合并
+    for hour, da in ((1, 20), (2, 40), (3, None)):
+        observe(db, OLD + timedelta(hours=hour), **{"a.com": (da, 500)})
+    compact_history(db, now=NOW)
+    db.commit()
+
+    rollup = rollups(db)[("a.com", OLD.date())]
+    assert (rollup.samples, rollup.da_samples) == (4, 3)
+    assert rollup.da_avg == pytest.approx(70 / 3)
+    assert (rollup.da_min, rollup.da_max) == (10, 40)
+    assert rollup.backlinks_avg == pytest.approx(400.0)
+    assert rollup.backlinks_max == 500
+
+
+def test_null_da_is_ignored(db):
+    observe(db, OLD, **{"a.com": (None, 10), "b.com": (None, 5)})
+    observe(db, OLD + timedelta(hours=1), **{"a.com": (30, 10)})
+    compact_history(db, now=NOW)
+    db.commit()
+
+    by_key = rollups(db)
+    a, b = by_key[("a.com", OLD.date())], by_key[("b.com", OLD.date())]
+    assert (a.samples, a.da_samples, a.da_avg, a.da_min) == (2, 1, 30.0, 30)
+    assert (b.da_samples, b.da_avg, b.da_min, b.da_max) == (0, None, None, None)
+
+
+def test_old_rollups_expire(db):
+    expired_day = NOW.date() - timedelta(days=settings.history_rollup_retention_days + 1)
+    kept_day = NOW.date() - timedelta(days=settings.history_rollup_retention_days)
+    db.add_all([
+        DomainDailyRollup(domain_name="a.com", day=expired_day, samples=1),
+        DomainDailyRollup(domain_name="a.com", day=kept_day, samples=1),
+    ])
+    db.commit()
+
+    assert compact_history(db, now=NOW)["expired"] == 1
+    db.commit()
+    assert list(rollups(db)) == [("a.com", kept_day)]
+
+
+def test_history_series_stitches_rollups_and_raw(db):
+    observe(db, OLD, **{"a.com": (None, 10)})
+    observe(db, NOW, **{"a.com": (25, 20)})
+    compact_history(db, now=NOW)
+    db.commit()
+
+    points = get_domain_history(db, "a.com")
+    assert [p["resolution"] for p in points] == ["daily", "raw"]
+    assert points[0]["da_score"] is None and points[1]["da_score"] == 25
+
+
+@pytest.fixture
+def movers_db(db):
+    """汇总起点 + 原始快照终点，DA 变化：up.com +20, down.com -15, flat.com 0, small.com +5"""
+    start_day = (datetime.now() - timedelta(days=5)).date()
+    db.add_all([
+        DomainDailyRollup(domain_name=name, day=start_day, samples=1, da_samples=1, da_avg=da)
+        for name, da in (("up.com", 10), ("down.com", 40), ("flat.com", 30))
+    ])
+    db.commit()
+    observe(db, datetime.now() - timedelta(days=3), **{"small.com": (10, 0)})
+    observe(db, datetime.now() - timedelta(hours=1),
+            **{"up.com": (30, 0), "down.com": (25, 0), "flat.com": (30, 0), "small.com": (15, 0)})
+    # 未评分的快照不参与计算
+    observe(db, datetime.now(), **{"up.com": (None, 0)})
+    return db
+
+
+@pytest.mark.parametrize("direction, expected", [
+    ("up", [("up.com", 20), ("small.com", 5)]),
+    ("down", [("down.com", -15)]),
+    ("abs", [("up.com", 20), ("down.com", -15), ("small.com", 5)]),
+])
+def test_top_movers_ordering(movers_db, direction, expected):
+    movers = get_top_movers(movers_db, days=7, direction=direction)
+    assert [(m["name"], m["change"]) for m in movers] == expected
+
+
+def test_top_movers_respects_limit_and_window(movers_db):
+    assert [m["name"] for m in get_top_movers(movers_db, days=7, limit=1)] == ["up.com"]
+    # 2 天窗口内只剩原始快照：small.com 只有一个点，没有变化
+    assert get_top_movers(movers_db, days=2, direction="abs") == []
+
+
+@pytest.mark.parametrize("value", ["2025-03-01", date(2025, 3, 1), datetime(2025, 3, 1, 8, 30)])
+def test_as_date_accepts_sqlite_and_postgres_values(value):
+    assert _as_date(value) == date(2025, 3, 1)
+
+
+def test_api_compaction_is_throttled_and_isolated(db, monkeypatch):
+    endpoints = pytest.importorskip("app.api.v1.endpoints")
+    from app.services.work_queue import LocalWorkQueue
+
+    calls = []
+
+    def failing_compaction(session):
+        calls.append(1)
+        raise RuntimeError("uq_domain_daily_rollups_name_day")
+
+    monkeypatch.setattr(settings, "redis_url", "")
+    monkeypatch.setattr(endpoints, "_local_locks", LocalWorkQueue())
+    monkeypatch.setattr(endpoints, "compact_history", failing_compaction)
+    observe(db, NOW, **{"a.com": (10, 1)})
+
+    endpoints._maybe_compact_history(db)
+    endpoints._maybe_compact_history(db)  # 间隔内不再压缩
+    assert len(calls) == 1
+    assert raw_count(db) == 1
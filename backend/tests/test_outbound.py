@@ -0,0 +1,331 @@
+import asyncio
+import random
+
+import pytest
+
+from app.services.outbound import (
+    CircuitBreaker,
+    CircuitOpenError,
+    OutboundError,
+    OutboundHTTPError,
+    OutboundManager,
+    RedisCircuitBreaker,
+    RedisTokenBucket,
+    ServicePolicy,
+    TokenBucket,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds: float):
+        self.sleep(seconds)
+        await asyncio.sleep(0)
+
+
+class FlakyStub:
+    """前 failures 次调用抛出 error，之后返回 result"""
+
+    def __init__(self, failures: int, error: Exception = None, result="ok"):
+        self.failures = failures
+        self.error = error or OutboundHTTPError("stub", 503)
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return self.result
+
+
+def make_manager(clock: FakeClock, **policy) -> OutboundManager:
+    defaults = dict(rate=100.0, burst=100, max_retries=0, backoff_base=0.5, backoff_max=8.0,
+                    failure_threshold=2, reset_timeout=10.0)
+    defaults.update(policy)
+    return OutboundManager({"stub": ServicePolicy(**defaults)}, clock=clock, sleep=clock.sleep,
+                           async_sleep=clock.async_sleep, rng=random.Random(7))
+
+
+def test_token_bucket_waits_for_deficit():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, burst=2, clock=clock)
+
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+
+    clock.now += 1.5  # 补回 3 个令牌，欠额 2 个 -> 剩 1 个
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.5
+
+
+def test_token_bucket_never_exceeds_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1.0, burst=3, clock=clock)
+    clock.now += 3600
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.0, 1.0]
+
+
+def test_manager_sleeps_for_rate_limit():
+    clock = FakeClock()
+    manager = make_manager(clock, rate=1.0, burst=1)
+    for _ in range(3):
+        manager.call("stub", lambda: None)
+    assert clock.sleeps == [0.0, 1.0, 1.0]
+
+
+@pytest.mark.parametrize("attempt", range(8))
+def test_backoff_is_full_jitter_within_cap(attempt):
+    manager = make_manager(FakeClock())
+    policy = ServicePolicy(backoff_base=0.5, backoff_max=8.0)
+    cap = min(8.0, 0.5 * 2 ** attempt)
+    samples = [manager._backoff(policy, attempt) for _ in range(500)]
+    assert all(0 <= s <= cap for s in samples)
+    assert max(samples) > cap * 0.9
+
+
+def test_retries_retryable_errors_with_backoff():
+    clock = FakeClock()
+    manager = make_manager(clock, max_retries=2, failure_threshold=10)
+    stub = FlakyStub(failures=2)
+
+    assert manager.call("stub", stub) == "ok"
+    assert stub.calls == 3
+    # 3 次令牌等待（0）+ 2 次退避
+    backoffs = [s for s in clock.sleeps if s > 0]
+    assert len(backoffs) <= 2 and all(s <= 1.0 for s in backoffs)
+    assert manager.snapshot()["stub"]["retries"] == 2
+
+
+def test_breaker_closed_open_half_open_closed():
+    clock = FakeClock()
+    manager = make_manager(clock)
+    failing = FlakyStub(failures=100)
+
+    for _ in range(2):
+        with pytest.raises(OutboundHTTPError):
+            manager.call("stub", failing)
+    assert manager.snapshot()["stub"]["circuit"] == "open"
+
+    # 熔断期间快速失败，不再调用下游
+    with pytest.raises(CircuitOpenError):
+        manager.call("stub", failing)
+    assert failing.calls == 2
+
+    clock.now += 10
+    assert manager.call("stub", FlakyStub(failures=0)) == "ok"
+    assert manager.snapshot()["stub"]["circuit"] == "closed"
+
+
+def test_half_open_allows_single_probe_and_reopens_on_failure():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5.0, clock=clock)
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now += 5
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # 探测进行中，其余请求被拒
+
+    assert breaker.record_failure() is True
+    assert breaker.state == "open"
+    assert breaker.retry_in() == 5.0
+
+
+def test_client_errors_do_not_trip_breaker_or_retry():
+    clock = FakeClock()
+    manager = make_manager(clock, max_retries=3, failure_threshold=1)
+    stub = FlakyStub(failures=100, error=OutboundHTTPError("stub", 404))
+
+    for _ in range(3):
+        with pytest.raises(OutboundHTTPError):
+            manager.call("stub", stub)
+    assert stub.calls == 3
+    assert manager.snapshot()["stub"]["circuit"] == "closed"
+
+
+def test_passthrough_errors_count_as_success():
+    class NotFound(Exception):
+        pass
+
+    clock = FakeClock()
+    manager = make_manager(clock, max_retries=3, failure_threshold=1)
+    stub = FlakyStub(failures=100, error=NotFound())
+
+    with pytest.raises(NotFound):
+        manager.call("stub", stub, passthrough=(NotFound,))
+    assert stub.calls == 1
+    snapshot = manager.snapshot()["stub"]
+    assert snapshot["circuit"] == "closed"
+    assert snapshot["successes"] == 1 and snapshot["failures"] == 0
+
+
+def test_async_call_retries_and_trips():
+    clock = FakeClock()
+    manager = make_manager(clock, max_retries=1, failure_threshold=2)
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        raise OutboundError("down")
+
+    async def main():
+        with pytest.raises(OutboundError):
+            await manager.call_async("stub", failing)
+        with pytest.raises(CircuitOpenError):
+            await manager.call_async("stub", failing)
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_cancelled_half_open_probe_releases_breaker():
+    clock = FakeClock()
+    manager = make_manager(clock, failure_threshold=1)
+    with pytest.raises(OutboundHTTPError):
+        manager.call("stub", FlakyStub(failures=1))
+    clock.now += 10
+
+    async def main():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.Event().wait()
+
+        task = asyncio.create_task(manager.call_async("stub", hang))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        async def ok():
+            return "ok"
+
+        return await manager.call_async("stub", ok)
+
+    assert asyncio.run(main()) == "ok"
+    assert manager.snapshot()["stub"]["circuit"] == "closed"
+
+
+def test_whois_socket_failure_is_reported_as_outbound_error(monkeypatch):
+    whois = pytest.importorskip("whois")
+    from whois.parser import WhoisEntry
+    from app.services import scanner as scanner_module
+
+    monkeypatch.setattr(
+        scanner_module.whois, "whois",
+        lambda name: WhoisEntry.load(name, "Socket not responding: [Errno 110] Connection timed out"),
+    )
+    scanner = scanner_module.DomainScanner.__new__(scanner_module.DomainScanner)
+    with pytest.raises(OutboundError):
+        scanner._whois_lookup("example.com")
+
+
+def test_redis_bucket_is_shared_between_processes():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+    # 两个进程各自的桶对象指向同一个 key，共用一份额度
+    a = RedisTokenBucket(client, "test:bucket", rate=1.0, burst=2)
+    b = RedisTokenBucket(client, "test:bucket", rate=1.0, burst=2)
+
+    assert a.reserve() == 0.0
+    assert b.reserve() == 0.0
+    assert a.reserve() > 0.9
+    assert b.reserve() > 1.9
+
+
+def test_redis_breaker_open_state_is_shared():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis()
+    clock = FakeClock()
+    a = RedisCircuitBreaker(client, "test:open", failure_threshold=1, reset_timeout=30.0, clock=clock)
+    b = RedisCircuitBreaker(client, "test:open", failure_threshold=1, reset_timeout=30.0, clock=clock)
+
+    assert a.record_failure() is True
+    assert not b.allow()
+    assert b.retry_in() > 0
+
+    clock.now += 30
+    client.delete("test:open")  # 共享标记按 Redis 时间过期，这里直接模拟
+    assert a.allow() and a.state == "half_open"
+    a.record_success()
+    assert b.allow()
+
+
+def test_use_redis_keeps_policies():
+    fakeredis = pytest.importorskip("fakeredis")
+    manager = make_manager(FakeClock(), rate=3.0, burst=5)
+    manager.use_redis(fakeredis.FakeRedis(), prefix="test")
+
+    assert manager.call("stub", lambda: "ok") == "ok"
+    svc = manager._service("stub")
+    assert isinstance(svc.bucket, RedisTokenBucket) and svc.bucket.rate == 3.0
+    assert manager.snapshot()["stub"]["tokens"] == 4.0
+
+
+def test_default_policies_come_from_settings(monkeypatch):
+    from app.core.config import settings
+    from app.services.outbound import policy_from_settings
+
+    monkeypatch.setattr(settings, "outbound_whois_rate", 0.25)
+    monkeypatch.setattr(settings, "outbound_whois_max_concurrency", 7)
+    policy = policy_from_settings("whois", backoff_max=3.0)
+    assert (policy.rate, policy.max_concurrency, policy.backoff_max) == (0.25, 7, 3.0)
+    assert policy.burst == settings.outbound_whois_burst
+
+
+def test_whois_outage_raises_only_in_strict_mode(monkeypatch):
+    pytest.importorskip("whois")
+    from app.services import scanner as scanner_module
+
+    def unreachable(name):
+        raise ConnectionError("whois server unreachable")
+
+    clock = FakeClock()
+    manager = OutboundManager({"whois": ServicePolicy(max_retries=0, failure_threshold=2)},
+                              clock=clock, sleep=clock.sleep)
+    monkeypatch.setattr(scanner_module, "outbound", manager)
+    monkeypatch.setattr(scanner_module.whois, "whois", unreachable)
+    scanner = scanner_module.DomainScanner.__new__(scanner_module.DomainScanner)
+
+    assert scanner.verify_expiry_date_via_whois("example.com")["is_valid"] is False
+    with pytest.raises(ConnectionError):
+        scanner.verify_expiry_date_via_whois("example.com", strict=True)
+    # 熔断后 strict 模式同样抛出，而不是返回"未过期"
+    with pytest.raises(CircuitOpenError):
+        scanner.verify_expiry_date_via_whois("example.com", strict=True)
+
+
+def test_redis_outage_falls_back_to_local_state():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    clock = FakeClock()
+    manager = make_manager(clock, rate=1.0, burst=1, failure_threshold=1)
+    manager.use_redis(fakeredis.FakeRedis(server=server), prefix="test")
+    server.connected = False
+
+    assert manager.call("stub", lambda: "ok") == "ok"
+    manager.call("stub", lambda: "ok")
+    assert clock.sleeps[-1] == 1.0  # 进程内令牌桶仍在限速
+    assert manager.snapshot()["stub"]["tokens"] == 0.0
+
+    with pytest.raises(OutboundHTTPError):
+        manager.call("stub", FlakyStub(failures=1))
+    with pytest.raises(CircuitOpenError):
+        manager.call("stub", lambda: "ok")
+
+    # Redis 恢复后重新使用共享状态
+    server.connected = True
+    clock.now += 10
+    assert manager.call("stub", lambda: "ok") == "ok"
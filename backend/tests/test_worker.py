@@ -0,0 +1,257 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.models import Domain, DomainObservation
+from app.services.outbound import CircuitOpenError
+from app.services.work_queue import Job, LocalWorkQueue, RedisWorkQueue
+from app.services.worker import ScanWorker, merge_domains, submit_scan
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class StubScanner:
+    """页面内容直接是解析结果；可指定失败的页码和评分失败次数"""
+
+    def __init__(self, pages, da_scores, expired=(), fail_pages=(), score_failures=0, whois_failures=0):
+        self.pages = pages
+        self.da_scores = da_scores
+        self.expired = set(expired)
+        self.fail_pages = set(fail_pages)
+        self.score_failures = score_failures
+        self.whois_failures = whois_failures
+        self.scored = []
+        self.verified = []
+
+    async def fetch_page_html(self, page):
+        if page in self.fail_pages:
+            raise RuntimeError(f"page {page} down")
+        return self.pages.get(page, [])
+
+    def parse_listing_page(self, content):
+        return [{"name": name, "backlinks": bl, "da_score": 0, "status": "pending"} for name, bl in content]
+
+    def batch_get_pagerank(self, names, strict=False):
+        if self.score_failures:
+            self.score_failures -= 1
+            raise RuntimeError("openpagerank down")
+        self.scored.extend(names)
+        return {n: self.da_scores[n] for n in names if n in self.da_scores}
+
+    def verify_expiry_date_via_whois(self, name, strict=False):
+        if self.whois_failures:
+            self.whois_failures -= 1
+            raise CircuitOpenError("whois", 60.0)
+        self.verified.append(name)
+        if name in self.expired:
+            return {"real_expiry": date(2025, 1, 1), "is_expired": True, "is_valid": True}
+        return {"real_expiry": date(2030, 1, 1), "is_expired": False, "is_valid": True}
+
+
+@pytest.fixture
+def queue():
+    return LocalWorkQueue(lease_seconds=30, clock=FakeClock())
+
+
+def drain(worker, queue):
+    while True:
+        job = queue.reserve(timeout=0)
+        if job is None:
+            return
+        worker.process(job)
+
+
+def domains(db):
+    return {d.name: d for d in db.scalars(select(Domain))}
+
+
+def observation_count(db, name):
+    return db.scalar(select(func.count()).where(DomainObservation.domain_name == name))
+
+
+PAGES = {
+    1: [("a.com", 10), ("b.com", 20), ("c.com", 30)],
+    2: [("c.com", 30), ("d.com", 40)],  # c.com 在两页里都出现
+}
+
+
+def test_pipeline_scores_each_domain_once(db, queue):
+    scanner = StubScanner(PAGES, {"a.com": 50, "b.com": 5, "c.com": 20, "d.com": 1}, expired={"a.com"})
+    worker = ScanWorker(queue, scanner=scanner, db=db)
+
+    submit_scan(queue, pages=2, pages_per_job=1)
+    drain(worker, queue)
+
+    assert sorted(scanner.scored) == ["a.com", "b.com", "c.com", "d.com"]
+    assert sorted(scanner.verified) == ["a.com", "c.com"]
+    rows = domains(db)
+    assert rows["a.com"].status == "expired_confirmed" and rows["a.com"].drop_date == date(2025, 1, 1)
+    assert rows["c.com"].status == "scraped" and rows["c.com"].da_score == 20
+    assert all(observation_count(db, name) == 1 for name in rows)
+    assert queue.stats() == {"ready": 0, "leased": 0}
+
+
+def test_redelivered_job_does_not_duplicate_downstream_jobs(db, queue):
+    scanner = StubScanner(PAGES, {})
+    worker = ScanWorker(queue, scanner=scanner, db=db)
+    job = Job("fetch_pages", "scan-1", {"pages": [1, 2]})
+
+    # 同一个任务被执行两次（例如租约过期后被另一个 worker 重新领取）
+    worker.handle_fetch_pages(job)
+    worker.handle_fetch_pages(job)
+
+    score_jobs = [queue.reserve(timeout=0) for _ in range(queue.stats()["ready"])]
+    names = [d["name"] for j in score_jobs for d in j.payload["domains"]]
+    assert sorted(names) == ["a.com", "b.com", "c.com", "d.com"]
+
+
+def test_ack_after_requeue_does_not_crash_reserve(queue):
+    clock = queue._clock
+    job_id = queue.put(Job("fetch_pages", "scan-1", {"pages": [1]}))
+    assert queue.reserve(timeout=0).id == job_id
+
+    clock.now += 31
+    assert queue.requeue_expired() == 1
+    queue.ack(job_id)  # 原 worker 迟到的 ack
+
+    assert queue.reserve(timeout=0) is None
+    assert queue.stats() == {"ready": 0, "leased": 0}
+
+
+def test_renew_keeps_running_job_leased(queue):
+    clock = queue._clock
+    job_id = queue.put(Job("fetch_pages", "scan-1", {"pages": [1]}))
+    queue.reserve(timeout=0)
+
+    clock.now += 20
+    assert queue.renew(job_id)
+    clock.now += 20
+    assert queue.requeue_expired() == 0
+
+    queue.ack(job_id)
+    assert not queue.renew(job_id)
+
+
+def test_fetch_failure_is_retried_not_acked(db, queue):
+    scanner = StubScanner(PAGES, {}, fail_pages={2})
+    worker = ScanWorker(queue, scanner=scanner, db=db)
+    job_id = queue.put(Job("fetch_pages", "scan-1", {"pages": [1, 2]}))
+
+    assert worker.process(queue.reserve(timeout=0)) is False
+    assert queue.stats() == {"ready": 0, "leased": 1}
+
+    scanner.fail_pages.clear()
+    queue._clock.now += 31
+    queue.requeue_expired()
+    job = queue.reserve(timeout=0)
+    assert job.id == job_id and job.attempts == 1
+    assert worker.process(job) is True
+
+
+def test_whois_outage_is_retried_not_recorded_as_alive(db, queue):
+    scanner = StubScanner({}, {}, expired={"a.com"}, whois_failures=1)
+    worker = ScanWorker(queue, scanner=scanner, db=db)
+    job_id = queue.put(Job("verify", "scan-1", {"domains": [{"name": "a.com", "backlinks": 1, "da_score": 30}]}))
+
+    assert worker.process(queue.reserve(timeout=0)) is False
+    assert queue.stats() == {"ready": 0, "leased": 1}
+    assert observation_count(db, "a.com") == 0
+
+    queue._clock.now += 31
+    queue.requeue_expired()
+    job = queue.reserve(timeout=0)
+    assert job.id == job_id and job.attempts == 1
+    assert worker.process(job) is True
+    assert domains(db)["a.com"].status == "expired_confirmed"
+    assert observation_count(db, "a.com") == 1
+
+
+def test_score_failure_keeps_existing_da(db, queue):
+    merge_domains(db, [{"name": "a.com", "backlinks": 10, "da_score": 42}])
+    db.commit()
+    scanner = StubScanner({}, {"a.com": 7}, score_failures=1)
+    worker = ScanWorker(queue, scanner=scanner, db=db)
+    queue.put(Job("score", "scan-1", {"domains": [{"name": "a.com", "backlinks": 12}]}))
+
+    assert worker.process(queue.reserve(timeout=0)) is False
+    db.expire_all()
+    assert domains(db)["a.com"].da_score == 42
+    assert observation_count(db, "a.com") == 0
+
+
+def test_unscored_domain_keeps_existing_da(db, queue):
+    merge_domains(db, [{"name": "a.com", "backlinks": 10, "da_score": 42}])
+    db.commit()
+    worker = ScanWorker(queue, scanner=StubScanner({}, {}), db=db)
+    queue.put(Job("score", "scan-1", {"domains": [{"name": "a.com", "backlinks": 12}]}))
+
+    assert worker.process(queue.reserve(timeout=0)) is True
+    db.expire_all()
+    row = domains(db)["a.com"]
+    assert row.da_score == 42 and row.backlinks == 12
+    assert db.scalar(select(DomainObservation.da_score)) is None
+
+
+def test_rescan_keeps_confirmed_status(db, queue):
+    merge_domains(db, [{"name": "a.com", "status": "expired_confirmed"}])
+    db.commit()
+    worker = ScanWorker(queue, scanner=StubScanner(PAGES, {}), db=db)
+    queue.put(Job("fetch_pages", "scan-1", {"pages": [1]}))
+
+    drain(worker, queue)
+    db.expire_all()
+    rows = domains(db)
+    assert rows["a.com"].status == "expired_confirmed"
+    assert rows["b.com"].status == "scraped"
+
+
+def test_exhausted_verify_job_still_records_observation(db, queue, monkeypatch):
+    monkeypatch.setattr(settings, "worker_max_attempts", 1)
+    worker = ScanWorker(queue, scanner=StubScanner({}, {}), db=db)
+    job = Job("verify", "scan-1", {"domains": [{"name": "a.com", "backlinks": 1, "da_score": 30}]}, attempts=1)
+
+    assert worker.process(job) is False
+    assert observation_count(db, "a.com") == 1
+
+
+def test_compaction_runs_once_per_interval(db, queue):
+    worker = ScanWorker(queue, scanner=StubScanner({}, {}), db=db)
+    assert worker.maybe_compact_history() is True
+    assert worker.maybe_compact_history() is False
+
+    queue._clock.now += settings.history_compact_interval
+    assert worker.maybe_compact_history() is True
+
+
+def test_redis_queue_contract():
+    fakeredis = pytest.importorskip("fakeredis")
+    queue = RedisWorkQueue(fakeredis.FakeRedis(), prefix="test", lease_seconds=30, poll_interval=0)
+
+    first = queue.put_unique(Job("score", "scan-1", {"domains": [{"name": "a.com"}, {"name": "b.com"}]}),
+                             "score", ttl=60)
+    again = queue.put_unique(Job("score", "scan-1", {"domains": [{"name": "b.com"}, {"name": "c.com"}]}),
+                             "score", ttl=60)
+    assert [d["name"] for d in first.payload["domains"]] == ["a.com", "b.com"]
+    assert [d["name"] for d in again.payload["domains"]] == ["c.com"]
+    assert queue.put_unique(Job("score", "scan-1", {"domains": [{"name": "a.com"}]}), "score", ttl=60) is None
+
+    # ack 一个仍在就绪队列里的任务后，reserve 跳过它而不是崩溃
+    queue.ack(first.id)
+    job = queue.reserve(timeout=0)
+    assert job.id == again.id
+    assert queue.renew(job.id)
+    queue.ack(job.id)
+    assert not queue.renew(job.id)
+    assert queue.reserve(timeout=0) is None
+    assert queue.stats() == {"ready": 0, "leased": 0}
+
+    assert queue.try_lock("compact_history", 60)
+    assert not queue.try_lock("compact_history", 60)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Scan worker fleet: pulls fetch/score/verify jobs from the shared Redis queue
+Usage:
+    python worker.py --processes 4
+Submit work with POST /api/v1/scan/distributed. Run more copies on other nodes to scale out.
+Requires REDIS_URL; without it the script exits cleanly (the fleet is opt-in).
+"""
+import argparse
+import multiprocessing
+import signal
+
+from app.core.config import settings
+
+
+def run_one(stop):
+    from app.services.outbound import outbound
+    from app.services.work_queue import RedisWorkQueue
+    from app.services.worker import ScanWorker
+
+    # 进程级信号交给父进程统一处理
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    queue = RedisWorkQueue.from_url(settings.redis_url, lease_seconds=settings.worker_lease_seconds)
+    # 限速和熔断状态放在共享 Redis 中，整个集群共用一份额度，而不是每个进程各一份
+    outbound.use_redis(queue.redis)
+    ScanWorker(queue).run(stop=stop)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run DropRadar scan workers")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count())
+    args = parser.parse_args()
+
+    if not settings.redis_url:
+        # 分布式扫描是可选功能：未配置时正常退出，避免部署平台反复重启
+        print("⚠️ REDIS_URL is not configured, scan workers are disabled")
+        raise SystemExit(0)
+
+    ctx = multiprocessing.get_context("spawn")
+    stop = ctx.Event()
+    procs = [ctx.Process(target=run_one, args=(stop,), name=f"scan-worker-{i}") for i in range(args.processes)]
+    print(f"🚀 Starting {len(procs)} scan workers...")
+    for p in procs:
+        p.start()
+
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        stop.set()
+        for p in procs:
+            p.join()
+    print("✅ Workers stopped")